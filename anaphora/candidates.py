@@ -1,19 +1,187 @@
-from .morph import morph, normalize_word, get_pos
-from .resources import all_pronouns, collective_nouns, common_gender_nouns
-from .helpers import find_coord_groups, find_addressed_entity, get_speaker_context, get_attribution_entities
-from .tokenization import get_sentences, get_words
+from bisect import bisect_left, insort
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+from .morph import analyze, normalize_word
+from .resources import get_lexicon
+from .helpers import CoordGroup, is_subject_at
+from .document import DocumentAnalysis, SentenceAnalysis
+from .mention import Mention
 
 def is_collective_noun(word):
-    return normalize_word(word) in collective_nouns
+    return normalize_word(word) in get_lexicon().collective_nouns
 
 def is_common_gender_noun(word):
-    return normalize_word(word) in common_gender_nouns
+    return normalize_word(word) in get_lexicon().common_gender_nouns
+
+def sentence_candidates(sentence: SentenceAnalysis, doc: Optional[DocumentAnalysis] = None) -> List[Mention]:
+    lexicon = get_lexicon()
+    length = len(sentence.text)
+    clauses = doc.clauses if doc is not None else None
+    candidates = []
+    for token, parsed, normalized_word in zip(sentence.tokens, sentence.parses, sentence.normalized):
+        if parsed.pos == 'NOUN' or normalized_word in lexicon.all_pronouns:
+            clause = clauses.clause_at(token.start) if clauses is not None else None
+            first = doc.first_occurrences[normalized_word] if doc is not None else token.start - sentence.start
+            candidates.append(Mention.from_token(
+                token.text, token.start, token.end, parsed, normalized_word,
+                common_gender=normalized_word in lexicon.common_gender_nouns,
+                collective=normalized_word in lexicon.collective_nouns,
+                subject=is_subject_at(parsed, token.start - sentence.start, length),
+                clause=clause.index if clause is not None else -1,
+                clause_subject=clause is not None and is_subject_at(
+                    parsed, token.start - clause.start, clause.end - clause.start),
+                topic=is_subject_at(parsed, first, len(doc.text) if doc is not None else length),
+            ))
+    return candidates
+
+def group_mention(names: List[str]) -> Mention:
+    return Mention.entity(" и ".join(names), None, 'plur', True)
+
+
+class MentionWindow(list):
+    def __init__(self, mentions, index: Optional['CandidateIndex'] = None, first: int = 0, limit: int = 0,
+                 count: Optional[int] = None):
+        super().__init__(mentions)
+        self.index = index
+        self.first = first
+        self.limit = limit
+        self.count = len(self) if count is None else count
+
+
+def _start(mention: Mention) -> int:
+    return mention.start
+
+
+def select_agreeing(candidates: List[Mention], key: Hashable, predicate: Callable[[Mention], bool]) -> List[Mention]:
+    if not isinstance(candidates, MentionWindow) or candidates.index is None:
+        return [c for c in candidates if predicate(c)]
+    count = candidates.count
+    selected = []
+    i = 0
+    for start in candidates.index.select(candidates.first, candidates.limit, key, predicate):
+        i = bisect_left(candidates, start, i, count, key=_start)
+        selected.append(candidates[i])
+    selected.extend(c for c in candidates[count:] if predicate(c))
+    return selected
+
+
+class CandidateIndex:
+    def __init__(self, doc: DocumentAnalysis):
+        self.doc = doc
+        self.mentions: List[Mention] = []
+        self.starts: List[int] = []
+        self.buckets: Dict[tuple, List[int]] = {}
+        self._examples: Dict[tuple, Mention] = {}
+        self._accepted: Dict[Hashable, Tuple[int, List[tuple]]] = {}
+        self._indexed = set()
+        self._sentence_groups: Dict[int, List[Tuple[CoordGroup, Mention]]] = {}
+        self._groups: Dict[Tuple[int, int, Optional[int]], List[Mention]] = {}
+        self._addressed: Dict[int, Mention] = {}
+        self._speakers: Dict[int, List[Mention]] = {}
+
+    def _index_sentence(self, index: int):
+        if index in self._indexed:
+            return
+        sentence = self.doc.sentence(index)
+        mentions = sentence_candidates(sentence, self.doc)
+        pos = bisect_left(self.starts, sentence.start)
+        self.mentions[pos:pos] = mentions
+        self.starts[pos:pos] = [m.start for m in mentions]
+        for mention in mentions:
+            signature = mention.signature
+            bucket = self.buckets.get(signature)
+            if bucket is None:
+                self.buckets[signature] = [mention.start]
+                self._examples[signature] = mention
+            else:
+                insort(bucket, mention.start)
+        self._indexed.add(index)
+
+    def window(self, first: int, last: int, limit: Optional[int] = None) -> MentionWindow:
+        for i in range(first, last + 1):
+            self._index_sentence(i)
+        first_start = self.doc.sentence_spans[first][0]
+        limit = limit if limit is not None else self.doc.sentence_spans[last][1]
+        lo = bisect_left(self.starts, first_start)
+        hi = bisect_left(self.starts, limit)
+        return MentionWindow(self.mentions[lo:hi], self, first_start, limit)
+
+    def accepted_signatures(self, key: Hashable, predicate: Callable[[Mention], bool]) -> List[tuple]:
+        cached = self._accepted.get(key)
+        if cached is not None and cached[0] == len(self.buckets):
+            return cached[1]
+        signatures = [signature for signature, example in self._examples.items() if predicate(example)]
+        self._accepted[key] = (len(self.buckets), signatures)
+        return signatures
+
+    def select(self, first: int, limit: int, key: Hashable, predicate: Callable[[Mention], bool]) -> List[int]:
+        starts = []
+        for signature in self.accepted_signatures(key, predicate):
+            bucket = self.buckets[signature]
+            starts.extend(bucket[bisect_left(bucket, first):bisect_left(bucket, limit)])
+        starts.sort()
+        return starts
+
+    def sentence_groups(self, index: int) -> List[Tuple[CoordGroup, Mention]]:
+        groups = self._sentence_groups.get(index)
+        if groups is None:
+            groups = [(group, group_mention(group.names)) for group in self.doc.sentence(index).coord_groups]
+            self._sentence_groups[index] = groups
+        return groups
+
+    def groups(self, first: int, last: int, limit: Optional[int] = None) -> List[Mention]:
+        last = min(last, self.doc.sentence_count() - 1)
+        key = (first, last, limit)
+        groups = self._groups.get(key)
+        if groups is None:
+            pairs = [pair for i in range(first, last + 1) for pair in self.sentence_groups(i)
+                     if limit is None or pair[0].end <= limit]
+            pairs.sort(key=lambda pair: (pair[0].rank, pair[0].start))
+            groups = [mention for _, mention in pairs]
+            self._groups[key] = groups
+        return groups
+
+    def addressed_entity(self, pronoun_word: str, index: int, position: Optional[int] = None) -> Optional[Mention]:
+        sentence = self.doc.sentence(index)
+        if position is None:
+            position = sentence.word_end(pronoun_word)
+            if position is None:
+                return None
+        vocative = sentence.vocatives.after(position)
+        if vocative is None:
+            return None
+        candidate = self._addressed.get(vocative.start)
+        if candidate is None:
+            candidate = Mention.entity(vocative.text, vocative.gender, vocative.number)
+            self._addressed[vocative.start] = candidate
+        return candidate
+
+    def speaker_entries(self, pronoun_word: str, position: int) -> List[Mention]:
+        entries = self._speakers.get(position)
+        if entries is not None:
+            return entries
+        entries = []
+        speech = self.doc.speech
+        speaker = speech.speaker_at(position)
+        if speaker:
+            parsed = analyze(speaker)
+            entries.append(Mention.entity(speaker, parsed.gender, parsed.number))
+        if analyze(pronoun_word).person == '3per':
+            for ent in speech.attribution_at(position):
+                parsed_e = analyze(ent)
+                entries.append(Mention.entity(ent, parsed_e.gender, parsed_e.number))
+        self._speakers[position] = entries
+        return entries
+
+
+def get_candidate_index(doc: DocumentAnalysis) -> CandidateIndex:
+    if doc.candidate_index is None:
+        doc.candidate_index = CandidateIndex(doc)
+    return doc.candidate_index
+
 
 class ReferentSearchState:
     START = 'START'
     LOCATE_SENTENCE = 'LOCATE_SENTENCE'
-    EXTRACT_CONTEXT = 'EXTRACT_CONTEXT'
-    TOKENIZE_CONTEXT = 'TOKENIZE_CONTEXT'
     COLLECT_NOMINALS = 'COLLECT_NOMINALS'
     ADD_COORD_GROUPS = 'ADD_COORD_GROUPS'
     FIND_PRONOUN_WORD = 'FIND_PRONOUN_WORD'
@@ -23,159 +191,64 @@ class ReferentSearchState:
 
 
 class ReferentSearchDFA:
-    def __init__(self, text: str, pronoun_position: int):
-        self.text = text
+    def __init__(self, doc: DocumentAnalysis, pronoun_position: int):
+        self.doc = doc
+        self.index = get_candidate_index(doc)
         self.pronoun_position = pronoun_position
-        self.text_lower = text.lower()
-        self.sentences = get_sentences(text)
         self.current_sentence_idx = 0
-        self.current_sentence_start = 0
         self.start_sentence_idx = 0
         self.end_sentence_idx = 0
-        self.search_text = ''
-        self.word_positions = []
         self.pronoun_word = None
         self.candidates = []
         self.state = ReferentSearchState.START
 
-    def add_candidate(self, word, start, end, pos, normalized, gender=None, number=None, is_group=False):
-        self.candidates.append({
-            'word': word,
-            'start': start,
-            'end': end,
-            'pos': pos,
-            'normalized': normalized,
-            'gender': gender,
-            'number': number,
-            'is_group': is_group
-        })
-
     def step(self) -> bool:
         if self.state == ReferentSearchState.START:
-            self.state = ReferentSearchState.LOCATE_SENTENCE
+            self.state = ReferentSearchState.LOCATE_SENTENCE if self.doc.sentence_count() else ReferentSearchState.DONE
             return True
 
         if self.state == ReferentSearchState.LOCATE_SENTENCE:
-            current_pos = 0
-            for i, sentence in enumerate(self.sentences):
-                sentence_length = len(sentence)
-                if current_pos <= self.pronoun_position < current_pos + sentence_length:
-                    self.current_sentence_idx = i
-                    self.current_sentence_start = current_pos
-                    break
-                current_pos += sentence_length
+            self.current_sentence_idx = self.doc.sentence_index(self.pronoun_position)
             self.start_sentence_idx = max(0, self.current_sentence_idx - 3)
             self.end_sentence_idx = self.current_sentence_idx
-            self.state = ReferentSearchState.EXTRACT_CONTEXT
-            return True
-
-        if self.state == ReferentSearchState.EXTRACT_CONTEXT:
-            relevant_sentences = self.sentences[self.start_sentence_idx:self.end_sentence_idx+1]
-            if self.current_sentence_idx > 0:
-                relevant_part = self.text_lower[self.current_sentence_start:self.pronoun_position]
-                relevant_sentences[-1] = relevant_part
-            else:
-                relevant_sentences[0] = relevant_sentences[0][:self.pronoun_position]
-            self.search_text = " ".join(relevant_sentences)
-            self.state = ReferentSearchState.TOKENIZE_CONTEXT
-            return True
-
-        if self.state == ReferentSearchState.TOKENIZE_CONTEXT:
-            words = get_words(self.search_text)
-            current_pos = 0
-            self.word_positions = []
-            for word in words:
-                start = self.search_text.find(word, current_pos)
-                end = start + len(word)
-                self.word_positions.append((word, start, end))
-                current_pos = end
             self.state = ReferentSearchState.COLLECT_NOMINALS
             return True
 
         if self.state == ReferentSearchState.COLLECT_NOMINALS:
-            for word, start, end in self.word_positions:
-                parsed = morph.parse(word)[0]
-                pos = parsed.tag.POS
-                normalized_word = normalize_word(word)
-                gender = parsed.tag.gender
-                number = parsed.tag.number
-                if pos == 'NOUN' or normalized_word in all_pronouns:
-                    vy_forms = {'вы', 'вас', 'вам', 'вами'}
-                    if normalized_word in vy_forms:
-                        self.add_candidate(word, start, end, pos, normalized_word, None, 'sing')
-                        self.add_candidate(word, start, end, pos, normalized_word, None, 'plur')
-                    elif is_common_gender_noun(word):
-                        self.add_candidate(word, start, end, pos, normalized_word, 'masc', number)
-                        self.add_candidate(word, start, end, pos, normalized_word, 'femn', number)
-                    elif is_collective_noun(word):
-                        self.add_candidate(word, start, end, pos, normalized_word, gender, 'sing')
-                        self.add_candidate(word, start, end, pos, normalized_word, gender, 'plur')
-                    else:
-                        self.add_candidate(word, start, end, pos, normalized_word, gender, number)
+            mentions = self.index.window(self.start_sentence_idx, self.end_sentence_idx, self.pronoun_position)
+            if self.current_sentence_idx > 0:
+                current_start = self.doc.sentence_spans[self.current_sentence_idx][0]
+                split = bisect_left(mentions, current_start, key=lambda m: m.start)
+                mentions[split:] = [m.with_word(m.word.lower()) for m in mentions[split:]]
+            self.candidates = mentions
             self.state = ReferentSearchState.ADD_COORD_GROUPS
             return True
 
         if self.state == ReferentSearchState.ADD_COORD_GROUPS:
-            full_search_text = " ".join(self.sentences[self.start_sentence_idx:self.end_sentence_idx+1])
-            coord_groups = find_coord_groups(full_search_text)
-            for group in coord_groups:
-                if len(group) > 1:
-                    group_text = " и ".join(group)
-                    self.add_candidate(group_text, -1, -1, 'NOUN', group_text.lower(), None, 'plur', True)
+            self.candidates.extend(self.index.groups(self.start_sentence_idx, self.end_sentence_idx))
             self.state = ReferentSearchState.FIND_PRONOUN_WORD
             return True
 
         if self.state == ReferentSearchState.FIND_PRONOUN_WORD:
-            self.pronoun_word = None
-            import re
-            for m in re.finditer(r"[А-ЯЁа-яё]+", self.text):
-                if m.start() <= self.pronoun_position < m.end():
-                    self.pronoun_word = self.text[m.start():m.end()]
-                    break
+            self.pronoun_word = self.doc.word_at(self.pronoun_position)
             self.state = ReferentSearchState.ADD_ADDRESSED_ENTITY
             return True
 
         if self.state == ReferentSearchState.ADD_ADDRESSED_ENTITY:
             if self.pronoun_word:
                 for i in range(max(0, self.current_sentence_idx - 1), self.current_sentence_idx + 1):
-                    if i < len(self.sentences):
-                        sentence_to_check = self.sentences[i]
-                        addressed_entity = find_addressed_entity(self.pronoun_word, sentence_to_check)
-                        if addressed_entity:
-                            words_in_address = addressed_entity.split()
-                            main_noun = None
-                            for w in words_in_address:
-                                if get_pos(w) == 'NOUN':
-                                    main_noun = w
-                                    break
-                            if main_noun:
-                                parsed = morph.parse(main_noun)[0]
-                                gender = parsed.tag.gender
-                                number = parsed.tag.number
-                            else:
-                                gender = None
-                                number = 'plur'
-                            self.add_candidate(addressed_entity, -1, -1, 'NOUN', addressed_entity.lower(), gender, number)
+                    if i < self.doc.sentence_count():
+                        position = self.pronoun_position + len(self.pronoun_word) if i == self.current_sentence_idx else None
+                        addressed = self.index.addressed_entity(self.pronoun_word, i, position)
+                        if addressed:
+                            self.candidates.append(addressed)
                             break
             self.state = ReferentSearchState.ADD_SPEAKER_CONTEXT
             return True
 
         if self.state == ReferentSearchState.ADD_SPEAKER_CONTEXT:
             if self.pronoun_word:
-                speaker = get_speaker_context(self.pronoun_word, self.text, self.pronoun_position)
-                if speaker:
-                    parsed = morph.parse(speaker)[0]
-                    gender = parsed.tag.gender
-                    number = parsed.tag.number
-                    self.add_candidate(speaker, -1, -1, 'NOUN', speaker.lower(), gender, number)
-                pron_parsed = morph.parse(self.pronoun_word)[0]
-                if getattr(pron_parsed.tag, 'person', None) == '3per':
-                    attribution_entities = get_attribution_entities(self.pronoun_word, self.text, self.pronoun_position)
-                    for ent in attribution_entities:
-                        parsed_e = morph.parse(ent)[0]
-                        gender_e = parsed_e.tag.gender
-                        number_e = parsed_e.tag.number
-                        self.add_candidate(ent, -1, -1, 'NOUN', ent.lower(), gender_e, number_e)
+                self.candidates.extend(self.index.speaker_entries(self.pronoun_word, self.pronoun_position))
             self.state = ReferentSearchState.DONE
             return True
 
@@ -190,7 +263,6 @@ class ReferentSearchDFA:
         return self.candidates
 
 
-def find_candidates(text, pronoun_position):
-    dfa = ReferentSearchDFA(text, pronoun_position)
+def find_candidates(text, pronoun_position, doc=None):
+    dfa = ReferentSearchDFA(doc or DocumentAnalysis(text), pronoun_position)
     return dfa.run()
-
@@ -0,0 +1,37 @@
+import re
+from bisect import bisect_right
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+CLAUSE_DELIMITER = re.compile(r',|;|:|—|(?<= )и(?= )|(?<= )а(?= )|(?<= )но(?= )')
+
+
+class Clause(NamedTuple):
+    index: int
+    start: int
+    end: int
+
+
+class ClauseIndex:
+    def __init__(self, text: str, sentence_spans: Optional[Sequence[Tuple[int, int]]] = None):
+        self.clauses: List[Clause] = []
+        for start, end in sentence_spans if sentence_spans is not None else [(0, len(text))]:
+            self._split(text, start, end)
+        self._starts = [c.start for c in self.clauses]
+
+    def _split(self, text: str, start: int, end: int):
+        boundaries = [(m.start(), m.end()) for m in CLAUSE_DELIMITER.finditer(text, start, end)]
+        boundaries.append((end, end))
+        previous = start
+        for left, right in boundaries:
+            segment = text[previous:left]
+            stripped = segment.strip()
+            if stripped:
+                clause_start = previous + len(segment) - len(segment.lstrip())
+                self.clauses.append(Clause(len(self.clauses), clause_start, clause_start + len(stripped)))
+            previous = right
+
+    def clause_at(self, position: int) -> Optional[Clause]:
+        i = bisect_right(self._starts, position) - 1
+        if i >= 0 and position < self.clauses[i].end:
+            return self.clauses[i]
+        return None
@@ -0,0 +1,72 @@
+from typing import Dict, Hashable, List, Optional, Tuple
+from .mention import Mention
+
+Span = Tuple[int, int]
+ChainMember = Tuple[Optional[int], Optional[int], str]
+
+
+def mention_key(mention: Mention) -> Hashable:
+    if mention.has_offsets:
+        return (mention.start, mention.end)
+    return ('entity', mention.normalized)
+
+
+class ResolutionTable:
+    def __init__(self, text: Optional[str] = None):
+        self.text = text
+        self.resolved: Dict[Span, Optional[Mention]] = {}
+        self._pending = set()
+        self._parent: Dict[Hashable, Hashable] = {}
+        self._members: Dict[Hashable, ChainMember] = {}
+
+    def __contains__(self, span: Span) -> bool:
+        return span in self.resolved
+
+    def get(self, span: Span) -> Optional[Mention]:
+        return self.resolved.get(span)
+
+    def begin(self, span: Span) -> bool:
+        if span in self._pending or span in self.resolved:
+            return False
+        self._pending.add(span)
+        return True
+
+    def finish(self, span: Span, pronoun: str, reference: Optional[Mention],
+               antecedent: Optional[Mention] = None):
+        self._pending.discard(span)
+        self.resolved[span] = reference
+        self._add(span, (span[0], span[1], pronoun))
+        if antecedent is not None:
+            key = mention_key(antecedent)
+            if antecedent.has_offsets:
+                word = self.text[antecedent.start:antecedent.end] if self.text is not None else antecedent.word
+                self._add(key, (antecedent.start, antecedent.end, word))
+            else:
+                self._add(key, (None, None, antecedent.word))
+            self._union(span, key)
+
+    def _add(self, key: Hashable, member: ChainMember):
+        if key not in self._parent:
+            self._parent[key] = key
+            self._members[key] = member
+
+    def _find(self, key: Hashable) -> Hashable:
+        parent = self._parent
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    def _union(self, a: Hashable, b: Hashable):
+        root_a = self._find(a)
+        root_b = self._find(b)
+        if root_a != root_b:
+            self._parent[root_a] = root_b
+
+    def chains(self) -> List[List[ChainMember]]:
+        clusters: Dict[Hashable, List[ChainMember]] = {}
+        for key in self._parent:
+            clusters.setdefault(self._find(key), []).append(self._members[key])
+        result = [sorted(c, key=lambda m: (m[0] is None, m[0] or 0)) for c in clusters.values() if len(c) > 1]
+        result.sort(key=lambda c: (c[0][0] is None, c[0][0] or 0))
+        return result
@@ -1,6 +1,7 @@
-from typing import Dict, Any, Optional, List, Tuple
-from .tokenization import find_pronoun_indices
-from .pronoun_types import determine_pronoun_type
+import time
+from typing import Any, Optional, List, Tuple, NamedTuple
+from .document import DocumentAnalysis
+from .pronoun_types import pronoun_type_at
 from .candidates import find_candidates
 from .filters import (
     filter_personal_candidates,
@@ -9,9 +10,10 @@ from .filters import (
 )
 from .reflexive import filter_reflexive_candidates
 from .demonstrative import find_demonstrative_candidates, filter_demonstrative_candidates
-from .resources import idioms
 from .ranking import rank_candidates
-from .morph import normalize_word, morph
+from .morph import normalize_word, morph, cache_info
+from .mention import Mention
+from . import instrumentation
 
 
 class DFAState:
@@ -25,19 +27,67 @@ class DFAState:
     END = "END"
 
 
+FILTER_NAMES = {
+    'личное': 'PersonalFilterDFA',
+    'притяжательное': 'PossessiveFilterDFA',
+    'возвратное': 'ReflexiveFilterDFA',
+    'относительное': 'RelativeFilterDFA',
+    'указательное': 'DemonstrativeFilter',
+}
+
+
+class Annotation(NamedTuple):
+    start: int
+    end: int
+    pronoun: str
+    pronoun_type: Optional[str]
+    antecedent: Optional[str]
+    antecedent_start: Optional[int]
+    antecedent_end: Optional[int]
+
+
+def choose_candidate(filtered, pronoun_position: int) -> Optional[Mention]:
+    if isinstance(filtered, list):
+        pool = filtered
+        if len(pool) > 1:
+            ranked = rank_candidates(pool, pronoun_position)
+            return ranked[0] if ranked else None
+        if len(pool) == 1:
+            return pool[0]
+        return None
+    if isinstance(filtered, Mention):
+        return filtered
+    return None
+
+
+def render_annotations(text: str, annotations: List[Annotation]) -> str:
+    parts = []
+    last = 0
+    for annotation in annotations:
+        parts.append(text[last:annotation.end])
+        parts.append(f" [{annotation.antecedent}]")
+        last = annotation.end
+    parts.append(text[last:])
+    return "".join(parts)
+
+
 class AnaphoraDFA:
-    def __init__(self, text: str):
+    def __init__(self, text: str, start: int = 0):
         self.original_text: str = text
-        self.result_text: str = text
-        self.offset: int = 0
-        self.pronoun_spans: List[Tuple[int, int]] = find_pronoun_indices(text)
+        self.result_text: Optional[str] = None
+        self.doc: DocumentAnalysis = DocumentAnalysis(text)
+        self.pronoun_spans: List[Tuple[int, int]] = [span for span in self.doc.pronoun_spans if span[0] >= start]
+        self._pronoun_span_set = set(self.doc.pronoun_spans)
+        self.annotations: List[Annotation] = []
         self.current_index: int = 0
         self.current_pronoun_span: Optional[Tuple[int, int]] = None
         self.current_pronoun: Optional[str] = None
         self.current_type: Optional[str] = None
-        self.candidates: Optional[List[Dict[str, Any]]] = None
+        self.candidates: Optional[List[Mention]] = None
         self.filtered: Optional[Any] = None
-        self.reference_word: Optional[str] = None
+        self.reference: Optional[Mention] = None
+        self.metrics: Optional[instrumentation.Metrics] = instrumentation.active()
+        self._depth: int = 0
         self.state: str = DFAState.START
 
     def has_more(self) -> bool:
@@ -56,133 +106,43 @@ class AnaphoraDFA:
 
         if self.state == DFAState.PRONOUN_DETECTED:
             s, e = self.current_pronoun_span
-            next_word = None
-            if e < len(self.original_text):
-                import re
-                m = re.search(r"\b[а-яёА-ЯЁ]+\b", self.original_text[e:])
-                if m:
-                    next_word = m.group(0)
-            self.current_type = determine_pronoun_type(self.current_pronoun, next_word)
+            self.current_type = pronoun_type_at(self.doc, s, e)
             self.state = DFAState.TYPE_DETERMINED
             return True
 
         if self.state == DFAState.TYPE_DETERMINED:
-            s, e = self.current_pronoun_span
-            if self.current_type == 'указательное':
-                self.candidates = find_demonstrative_candidates(
-                    self.original_text, s, self.current_pronoun
-                )
-            else:
-                self.candidates = find_candidates(self.original_text, s)
+            s, _ = self.current_pronoun_span
+            self.candidates = self._find_candidates(self.current_type, s, self.current_pronoun)
             self.state = DFAState.CANDIDATES_FOUND
             return True
 
         if self.state == DFAState.CANDIDATES_FOUND:
-            text = self.original_text
-            pron = self.current_pronoun
-            pron_norm = normalize_word(pron)
-            s, e = self.current_pronoun_span
-            if self.current_type == 'личное':
-                self.filtered = filter_personal_candidates(self.candidates, pron, morph, text)
-            elif self.current_type == 'притяжательное':
-                self.filtered = filter_possessive_candidates(self.candidates, pron_norm, morph, text)
-            elif self.current_type == 'возвратное':
-                self.filtered = filter_reflexive_candidates(self.candidates, pron, morph, text, idioms)
-            elif self.current_type == 'относительное':
-                self.filtered = filter_relative_candidates(self.candidates, pron, morph, text)
-            elif self.current_type == 'указательное':
-                same_cands, prev_cands = self.candidates
-                self.filtered = filter_demonstrative_candidates(
-                    same_cands, prev_cands, pron, morph, text, s, e
-                )
-            else:
-                self.filtered = self.candidates
+            self.filtered = self._filter_candidates(
+                self.current_type, self.candidates, self.current_pronoun, self.current_pronoun_span
+            )
             self.state = DFAState.FILTERED
             return True
 
         if self.state == DFAState.FILTERED:
             s, _ = self.current_pronoun_span
-            filtered = self.filtered
-            if isinstance(filtered, list):
-                if len(filtered) > 1:
-                    ranked = rank_candidates(filtered, s, self.original_text, morph)
-                    self.reference_word = ranked[0]['word'] if ranked else 'None'
-                elif len(filtered) == 1:
-                    self.reference_word = filtered[0]['word']
-                else:
-                    self.reference_word = 'None'
-            elif filtered is None:
-                self.reference_word = 'None'
-            elif isinstance(filtered, dict):
-                self.reference_word = filtered.get('word', 'None')
-            else:
-                self.reference_word = 'None'
+            self.reference = choose_candidate(self.filtered, s)
             self.state = DFAState.RANKED
             return True
 
         if self.state == DFAState.RANKED:
-            def recursive_resolve_reference(reference_word: str, text: str, depth: int = 0, max_depth: int = 5) -> str:
-                if depth > max_depth or reference_word == 'None':
-                    return reference_word
-                pronoun_pos = None
-                for start, end in find_pronoun_indices(text):
-                    if text[start:end] == reference_word:
-                        pronoun_pos = start
-                        break
-                if pronoun_pos is None:
-                    return reference_word
-                next_word = None
-                if end < len(text):
-                    import re
-                    m = re.search(r"\b[а-яёА-ЯЁ]+\b", text[end:])
-                    if m:
-                        next_word = m.group(0)
-                ptype = determine_pronoun_type(reference_word, next_word)
-                if ptype == 'указательное':
-                    same_c, prev_c = find_demonstrative_candidates(text, pronoun_pos, reference_word)
-                    pron_end = pronoun_pos + len(reference_word)
-                    filt = filter_demonstrative_candidates(
-                        same_c, prev_c, reference_word, morph, text,
-                        pronoun_pos, pron_end
-                    )
-                else:
-                    cands = find_candidates(text, pronoun_pos)
-                    if ptype == 'личное':
-                        filt = filter_personal_candidates(cands, reference_word, morph, text)
-                    elif ptype == 'притяжательное':
-                        filt = filter_possessive_candidates(cands, normalize_word(reference_word), morph, text)
-                    elif ptype == 'возвратное':
-                        filt = filter_reflexive_candidates(cands, reference_word, morph, text, idioms)
-                    elif ptype == 'относительное':
-                        filt = filter_relative_candidates(cands, reference_word, morph, text)
-                    else:
-                        filt = cands
-                if isinstance(filt, list):
-                    preferred = [c for c in filt if c.get('pos') != 'NPRO']
-                    pool = preferred if preferred else filt
-                    if len(pool) > 1:
-                        ranked2 = rank_candidates(pool, pronoun_pos, text, morph)
-                        new_ref = ranked2[0]['word'] if ranked2 else 'None'
-                    elif len(pool) == 1:
-                        new_ref = pool[0]['word']
-                    else:
-                        new_ref = 'None'
-                elif filt is None:
-                    new_ref = 'None'
-                elif isinstance(filt, dict):
-                    new_ref = filt.get('word', 'None')
-                else:
-                    new_ref = 'None'
-                if new_ref == reference_word or new_ref == 'None':
-                    return new_ref
-                return recursive_resolve_reference(new_ref, text, depth + 1, max_depth)
-
-            self.reference_word = recursive_resolve_reference(self.reference_word, self.original_text)
-            _, e = self.current_pronoun_span
-            annotation = f" [{self.reference_word}]"
-            insert_pos = e + self.offset
-            self.result_text = self.result_text[:insert_pos] + annotation + self.result_text[insert_pos:]
-            self.offset += len(annotation)
+            s, e = self.current_pronoun_span
+            direct = self.reference
+            self.doc.resolutions.begin(self.current_pronoun_span)
+            self.reference = self._follow_chain(direct)
+            self.doc.resolutions.finish(self.current_pronoun_span, self.current_pronoun, self.reference, direct)
+            antecedent_start = antecedent_end = None
+            if self.reference is not None and self.reference.has_offsets:
+                antecedent_start, antecedent_end = self.reference.start, self.reference.end
+            self.annotations.append(Annotation(
+                s, e, self.current_pronoun, self.current_type,
+                self.reference.word if self.reference is not None else None,
+                antecedent_start, antecedent_end,
+            ))
             self.state = DFAState.ANNOTATED
             return True
 
@@ -193,7 +153,7 @@ class AnaphoraDFA:
             self.current_type = None
             self.candidates = None
             self.filtered = None
-            self.reference_word = None
+            self.reference = None
             self.state = DFAState.START
             return True
 
@@ -202,9 +162,97 @@ class AnaphoraDFA:
 
         return False
 
-    def run(self) -> str:
-        while self.step():
-            pass
-        return self.result_text
+    def _find_candidates(self, pronoun_type: Optional[str], position: int, pronoun: str):
+        if pronoun_type == 'указательное':
+            candidates = find_demonstrative_candidates(self.original_text, position, pronoun, self.doc)
+            if self.metrics is not None:
+                self.metrics.incr('candidates', len(candidates[0]) + len(candidates[1]))
+            return candidates
+        candidates = find_candidates(self.original_text, position, self.doc)
+        if self.metrics is not None:
+            self.metrics.incr('candidates', len(candidates))
+        return candidates
+
+    def _filter_candidates(self, pronoun_type: Optional[str], candidates, pronoun: str, span: Tuple[int, int]):
+        if self.metrics is None or pronoun_type not in FILTER_NAMES:
+            return self._apply_filter(pronoun_type, candidates, pronoun, span)
+        with self.metrics.timer('filter', FILTER_NAMES[pronoun_type]):
+            return self._apply_filter(pronoun_type, candidates, pronoun, span)
+
+    def _apply_filter(self, pronoun_type: Optional[str], candidates, pronoun: str, span: Tuple[int, int]):
+        text = self.original_text
+        doc = self.doc
+        s, e = span
+        if pronoun_type == 'личное':
+            return filter_personal_candidates(candidates, pronoun, morph, text)
+        if pronoun_type == 'притяжательное':
+            return filter_possessive_candidates(candidates, normalize_word(pronoun), morph, text, doc=doc, span=span)
+        if pronoun_type == 'возвратное':
+            return filter_reflexive_candidates(candidates, pronoun, morph, text, doc=doc, span=span)
+        if pronoun_type == 'относительное':
+            return filter_relative_candidates(candidates, pronoun, morph, text, doc=doc, span=span)
+        if pronoun_type == 'указательное':
+            same_cands, prev_cands = candidates
+            return filter_demonstrative_candidates(same_cands, prev_cands, pronoun, morph, text, s, e, doc=doc)
+        return candidates
+
+    def _follow_chain(self, reference: Optional[Mention]) -> Optional[Mention]:
+        if reference is None:
+            return None
+        span = (reference.start, reference.end)
+        table = self.doc.resolutions
+        if span in table:
+            return table.get(span)
+        if span in self._pronoun_span_set and table.begin(span):
+            return self._resolve_span(span)
+        return reference
 
+    def _resolve_span(self, span: Tuple[int, int]) -> Optional[Mention]:
+        self._depth += 1
+        if self.metrics is not None:
+            self.metrics.incr('chain_resolutions')
+            self.metrics.observe_max('chain_depth_max', self._depth)
+        s, e = span
+        pronoun = self.original_text[s:e]
+        pronoun_type = pronoun_type_at(self.doc, s, e)
+        candidates = self._find_candidates(pronoun_type, s, pronoun)
+        filtered = self._filter_candidates(pronoun_type, candidates, pronoun, span)
+        direct = choose_candidate(filtered, s)
+        reference = self._follow_chain(direct)
+        self.doc.resolutions.finish(span, pronoun, reference, direct)
+        self._depth -= 1
+        return reference
 
+    def chains(self):
+        return self.doc.resolutions.chains()
+
+    def run_structured(self) -> List[Annotation]:
+        if self.metrics is None:
+            while self.step():
+                pass
+            return self.annotations
+        return self._run_instrumented()
+
+    def _run_instrumented(self) -> List[Annotation]:
+        metrics = self.metrics
+        morph_before = cache_info()
+        started = time.perf_counter()
+        more = True
+        while more:
+            step_started = time.perf_counter()
+            more = self.step()
+            metrics.add_time('state', self.state, time.perf_counter() - step_started)
+        metrics.add_time('document', 'total', time.perf_counter() - started)
+        morph_after = cache_info()
+        for name in ('analyze', 'pos'):
+            before, after = morph_before[name], morph_after[name]
+            metrics.incr(f'morph_{name}_lookups', after.hits + after.misses - before.hits - before.misses)
+            metrics.incr(f'morph_{name}_parses', after.misses - before.misses)
+        metrics.incr('documents')
+        metrics.incr('pronouns', len(self.pronoun_spans))
+        metrics.incr('sentences', self.doc.sentence_count())
+        return self.annotations
+
+    def run(self) -> str:
+        self.result_text = render_annotations(self.original_text, self.run_structured())
+        return self.result_text
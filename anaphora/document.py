@@ -0,0 +1,166 @@
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Tuple
+from .tokenization import Token, tokenize, find_pronoun_indices, get_sentence_spans
+from .morph import WordAnalysis, analyze, normalize_word
+from .helpers import CoordGroup, find_coord_group_spans
+from .coreference import ResolutionTable
+from .clauses import ClauseIndex
+from .idioms import IdiomSpans, get_idiom_matcher
+from .speech import SpeechIndex
+from .vocative import VocativeIndex
+
+
+class SentenceAnalysis:
+    def __init__(self, doc: 'DocumentAnalysis', index: int, start: int, end: int):
+        self.index = index
+        self.start = start
+        self.end = end
+        self.text = doc.text[start:end]
+        self.tokens: List[Token] = doc.tokens_between(start, end)
+        self.parses: List[WordAnalysis] = [analyze(token.text) for token in self.tokens]
+        self.normalized: List[str] = [normalize_word(token.text) for token in self.tokens]
+        self._coord_groups: Optional[List[CoordGroup]] = None
+        self._vocatives: Optional[VocativeIndex] = None
+        self._word_ends: Optional[Dict[str, int]] = None
+
+    @property
+    def coord_groups(self) -> List[CoordGroup]:
+        if self._coord_groups is None:
+            self._coord_groups = find_coord_group_spans(self.text, self.start)
+        return self._coord_groups
+
+    @property
+    def vocatives(self) -> VocativeIndex:
+        if self._vocatives is None:
+            self._vocatives = VocativeIndex(self.text, self.start)
+        return self._vocatives
+
+    def word_end(self, word: str) -> Optional[int]:
+        if self._word_ends is None:
+            self._word_ends = {}
+            for token in reversed(self.tokens):
+                self._word_ends[token.text.lower()] = token.end
+        return self._word_ends.get(word.lower())
+
+
+class DocumentAnalysis:
+    def __init__(self, text: str):
+        self.text = text
+        self._sentence_spans: Optional[List[Tuple[int, int]]] = None
+        self._sentence_starts: List[int] = []
+        self._sentences: Dict[int, SentenceAnalysis] = {}
+        self._tokens: Optional[List[Token]] = None
+        self._token_starts: List[int] = []
+        self._pronoun_spans: Optional[List[Tuple[int, int]]] = None
+        self._first_occurrences: Optional[Dict[str, int]] = None
+        self._idiom_spans: Optional[IdiomSpans] = None
+        self._speech: Optional[SpeechIndex] = None
+        self._clauses: Optional[ClauseIndex] = None
+        self._conjunctions: Optional[List[int]] = None
+        self.candidate_index = None
+        self.resolutions = ResolutionTable(text)
+
+    @property
+    def sentence_spans(self) -> List[Tuple[int, int]]:
+        self._ensure_sentences()
+        return self._sentence_spans
+
+    def _ensure_sentences(self):
+        if self._sentence_spans is None:
+            self._sentence_spans = get_sentence_spans(self.text)
+            self._sentence_starts = [s for s, _ in self._sentence_spans]
+
+    @property
+    def tokens(self) -> List[Token]:
+        if self._tokens is None:
+            self._tokens = tokenize(self.text)
+            self._token_starts = [t.start for t in self._tokens]
+        return self._tokens
+
+    @property
+    def pronoun_spans(self) -> List[Tuple[int, int]]:
+        if self._pronoun_spans is None:
+            self._pronoun_spans = find_pronoun_indices(self.text, self.tokens)
+        return self._pronoun_spans
+
+    @property
+    def idiom_spans(self) -> IdiomSpans:
+        if self._idiom_spans is None:
+            self._idiom_spans = IdiomSpans(get_idiom_matcher().find(self.tokens))
+        return self._idiom_spans
+
+    @property
+    def speech(self) -> SpeechIndex:
+        if self._speech is None:
+            self._speech = SpeechIndex(self.text)
+        return self._speech
+
+    @property
+    def clauses(self) -> ClauseIndex:
+        if self._clauses is None:
+            self._clauses = ClauseIndex(self.text, self.sentence_spans)
+        return self._clauses
+
+    @property
+    def conjunctions(self) -> List[int]:
+        if self._conjunctions is None:
+            self._conjunctions = [t.start for t in self.tokens if t.text == 'и' or t.text == 'И']
+        return self._conjunctions
+
+    def has_conjunction(self, start: int, end: int) -> bool:
+        conjunctions = self.conjunctions
+        i = bisect_left(conjunctions, start)
+        return i < len(conjunctions) and conjunctions[i] + 1 <= end
+
+    def tokens_between(self, start: int, end: int) -> List[Token]:
+        tokens = self.tokens
+        return tokens[bisect_left(self._token_starts, start):bisect_left(self._token_starts, end)]
+
+    def token_at(self, position: int) -> Optional[Token]:
+        tokens = self.tokens
+        i = bisect_left(self._token_starts, position)
+        if i < len(tokens) and tokens[i].start == position:
+            return tokens[i]
+        return None
+
+    def token_after(self, position: int) -> Optional[Token]:
+        tokens = self.tokens
+        i = bisect_left(self._token_starts, position)
+        return tokens[i] if i < len(tokens) else None
+
+    def sentence_count(self) -> int:
+        return len(self.sentence_spans)
+
+    def sentence_index(self, position: int) -> int:
+        self._ensure_sentences()
+        return max(0, bisect_right(self._sentence_starts, position) - 1)
+
+    def sentence(self, index: int) -> SentenceAnalysis:
+        analysis = self._sentences.get(index)
+        if analysis is None:
+            start, end = self.sentence_spans[index]
+            analysis = SentenceAnalysis(self, index, start, end)
+            self._sentences[index] = analysis
+        return analysis
+
+    @property
+    def first_occurrences(self) -> Dict[str, int]:
+        if self._first_occurrences is None:
+            self._first_occurrences = {}
+            for token in reversed(self.tokens):
+                self._first_occurrences[normalize_word(token.text)] = token.start
+        return self._first_occurrences
+
+    def word_at(self, position: int) -> Optional[str]:
+        token = self.token_at(position)
+        return token.text if token is not None and token.is_word else None
+
+    def next_word(self, position: int) -> Optional[str]:
+        token = self.token_after(position)
+        if token is not None and not token.is_word:
+            token = token.next_word()
+        return token.text if token is not None else None
+
+    def next_word_pos(self, position: int) -> Optional[str]:
+        word = self.next_word(position)
+        return analyze(word).pos if word is not None else None
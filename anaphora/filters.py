@@ -1,7 +1,11 @@
 import re
-from typing import Iterable, Optional, Union, List, Dict
-from .morph import normalize_word
-from .helpers import is_subject_simple
+from typing import Iterable, Optional, Union, List, Dict, Tuple
+from .morph import analyze, normalize_word
+from .idioms import IdiomMatcher, IdiomSpans
+from .document import DocumentAnalysis
+from .candidates import MentionWindow, select_agreeing
+from .clauses import ClauseIndex
+from .mention import gender_mask
 
 class PersonalFilterState:
     START = 'START'
@@ -13,7 +17,7 @@ class PersonalFilterState:
 
 class PersonalFilterDFA:
     def __init__(self, candidates, pronoun, morph, sentence_text, is_first_word=False):
-        self.candidates = list(candidates or [])
+        self.candidates = candidates if isinstance(candidates, MentionWindow) else list(candidates or [])
         self.pronoun = pronoun
         self.morph = morph
         self.sentence_text = sentence_text
@@ -23,6 +27,17 @@ class PersonalFilterDFA:
         self.norm_pron = None
         self.pron_gender = None
         self.pron_number = None
+        self.rules = []
+
+    def _matches_gender_number(self, cand) -> bool:
+        if cand.is_group:
+            return cand.matches_number(self.pron_number)
+        if self.pronoun not in {'Вы', 'Вам', 'Вас', 'Вами'}:
+            return cand.agrees(self.pron_gender, self.pron_number)
+        return True
+
+    def _accepts(self, cand) -> bool:
+        return all(rule(cand) for rule in self.rules)
 
     def step(self) -> bool:
         if self.state == PersonalFilterState.START:
@@ -31,43 +46,29 @@ class PersonalFilterDFA:
             return True
 
         if self.state == PersonalFilterState.PARSE_PRONOUN:
-            parsed_pron = self.morph.parse(self.pronoun)[0]
+            parsed_pron = analyze(self.pronoun)
             if self.pronoun.lower() == 'её':
                 self.pron_gender = 'femn'
             else:
-                self.pron_gender = parsed_pron.tag.gender
-            self.pron_number = parsed_pron.tag.number
+                self.pron_gender = parsed_pron.gender
+            self.pron_number = parsed_pron.number
             self.state = PersonalFilterState.MATCH_GENDER_NUMBER
             return True
 
         if self.state == PersonalFilterState.MATCH_GENDER_NUMBER:
-            filtered = []
-            for cand in self.candidates:
-                if cand.get('is_group'):
-                    if cand['number'] == self.pron_number or self.pron_number is None:
-                        filtered.append(cand)
-                elif self.pronoun not in {'Вы', 'Вам', 'Вас', 'Вами'}:
-                    if ((cand['gender'] == self.pron_gender or self.pron_gender is None)
-                        and (cand['number'] == self.pron_number or self.pron_number is None)):
-                        filtered.append(cand)
-                else:
-                    filtered.append(cand)
-            self.filtered = filtered
+            self.rules = [self._matches_gender_number]
             self.state = PersonalFilterState.APPLY_SPECIAL_RULES
             return True
 
         if self.state == PersonalFilterState.APPLY_SPECIAL_RULES:
-            filtered = self.filtered
             if self.norm_pron == 'ты':
-                filtered = [cand for cand in filtered if _is_animate(cand, self.morph)]
-            if self.pronoun in {'Вы', 'Вас', 'Вам', 'Вами'}:
-                if self.is_first_word:
-                    filtered = [cand for cand in filtered if cand['number'] in ('sing', 'plur', None)]
-                else:
-                    filtered = [cand for cand in filtered if cand['number'] == 'sing' or cand.get('is_group')]
+                self.rules.append(_is_animate)
+            if self.pronoun in {'Вы', 'Вас', 'Вам', 'Вами'} and not self.is_first_word:
+                self.rules.append(lambda cand: cand.has_number('sing') or cand.is_group)
             if self.norm_pron in {'вы', 'вас', 'вам', 'вами'} and self.pronoun and self.pronoun[0].islower():
-                filtered = [cand for cand in filtered if cand['number'] == 'plur' or cand.get('is_group')]
-            self.filtered = filtered
+                self.rules.append(lambda cand: cand.has_number('plur') or cand.is_group)
+            key = ('personal', self.pronoun, self.is_first_word)
+            self.filtered = select_agreeing(self.candidates, key, self._accepts)
             self.state = PersonalFilterState.DONE
             return True
 
@@ -81,21 +82,15 @@ class PersonalFilterDFA:
             pass
         return self.filtered
 
-def _is_animate(cand, morph):
-    if cand['pos'] == 'NOUN':
-        parsed = morph.parse(cand['word'])[0]
-        return 'anim' in parsed.tag
-    return True
+def _is_animate(cand):
+    return cand.pos != 'NOUN' or cand.animate
 
 def filter_personal_candidates(candidates, pronoun, morph, sentence_text, is_first_word=False):
     dfa = PersonalFilterDFA(candidates, pronoun, morph, sentence_text, is_first_word)
     return dfa.run()
 
 def split_to_simple_clauses(complex_sentence):
-    delimiters = r',|;|:|—|(?<= )и(?= )|(?<= )а(?= )|(?<= )но(?= )'
-    clauses = re.split(delimiters, complex_sentence)
-    clauses = [cl.strip() for cl in clauses if cl.strip()]
-    return clauses
+    return [complex_sentence[c.start:c.end] for c in ClauseIndex(complex_sentence).clauses]
 
 def find_simple_clause_with_pronoun(text, pronoun):
     clauses = split_to_simple_clauses(text)
@@ -117,15 +112,17 @@ class PossessiveFilterState:
 
 
 class PossessiveFilterDFA:
-    def __init__(self, candidates, pronoun, morph, sentence_text):
-        self.candidates = list(candidates or [])
+    def __init__(self, candidates, pronoun, morph, sentence_text, doc=None, span: Optional[Tuple[int, int]] = None):
+        self.candidates = candidates if isinstance(candidates, MentionWindow) else list(candidates or [])
         self.pronoun = pronoun
         self.morph = morph
         self.sentence_text = sentence_text
+        self.doc = doc or DocumentAnalysis(sentence_text)
         self.state = PossessiveFilterState.START
         self.norm_pron = None
         self.filtered: List[Dict] = []
-        self.simple_clause = sentence_text
+        self.pron_start = span[0] if span is not None else None
+        self.clause = None
 
     def step(self) -> bool:
         if self.state == PossessiveFilterState.START:
@@ -134,17 +131,19 @@ class PossessiveFilterDFA:
             return True
 
         if self.state == PossessiveFilterState.PREPARE:
-            pronoun_pos = self.sentence_text.lower().find(self.norm_pron)
-            if pronoun_pos == -1:
-                self.simple_clause = self.sentence_text
-            else:
-                self.simple_clause = find_simple_clause_with_pronoun(self.sentence_text, self.pronoun)
+            if self.pron_start is None:
+                pronoun_token = next((t for t in self.doc.tokens if normalize_word(t.text) == self.norm_pron), None)
+                self.pron_start = pronoun_token.start if pronoun_token is not None else None
+            if self.pron_start is not None:
+                self.clause = self.doc.clauses.clause_at(self.pron_start)
             self.state = PossessiveFilterState.HANDLE_SVOY
             return True
 
         if self.state == PossessiveFilterState.HANDLE_SVOY:
             if self.norm_pron in {'свой', 'своя', 'свои', 'своими', 'своих', 'свое', 'своей', 'своим', 'своем', 'своего', 'свою', 'своему'}:
-                subject_candidates = [cand for cand in self.candidates if is_subject_simple(cand['word'], self.simple_clause, self.morph)]
+                clause = self.clause.index if self.clause is not None else None
+                subjects = [cand for cand in self.candidates if cand.clause_subject]
+                subject_candidates = [cand for cand in subjects if cand.clause == clause] or subjects
                 if subject_candidates:
                     self.filtered = subject_candidates
                     self.state = PossessiveFilterState.DONE
@@ -154,12 +153,11 @@ class PossessiveFilterDFA:
 
         if self.state == PossessiveFilterState.HANDLE_EGO_EE:
             if self.norm_pron in {'его', 'её', 'ее'}:
-                parsed_pron = self.morph.parse(self.pronoun)[0]
-                pron_gender = parsed_pron.tag.gender
-                pron_number = parsed_pron.tag.number
-                self.filtered = [cand for cand in self.candidates
-                                 if (cand['gender'] == pron_gender or pron_gender is None)
-                                 and (cand['number'] == pron_number or pron_number is None)]
+                parsed_pron = analyze(self.pronoun)
+                pron_gender = parsed_pron.gender
+                pron_number = parsed_pron.number
+                self.filtered = select_agreeing(self.candidates, ('agrees', pron_gender, pron_number),
+                                                lambda cand: cand.agrees(pron_gender, pron_number))
                 self.state = PossessiveFilterState.DONE
                 return True
             self.state = PossessiveFilterState.HANDLE_IX
@@ -167,8 +165,10 @@ class PossessiveFilterDFA:
 
         if self.state == PossessiveFilterState.HANDLE_IX:
             if self.norm_pron == 'их':
-                non_pron_plural = [c for c in self.candidates if c['number'] == 'plur' and c.get('pos') != 'NPRO']
-                self.filtered = non_pron_plural if non_pron_plural else [cand for cand in self.candidates if cand['number'] == 'plur']
+                non_pron_plural = select_agreeing(self.candidates, ('plural_nominal',),
+                                                  lambda c: c.has_number('plur') and c.pos != 'NPRO')
+                self.filtered = non_pron_plural or select_agreeing(self.candidates, ('plural',),
+                                                                   lambda c: c.has_number('plur'))
                 self.state = PossessiveFilterState.DONE
                 return True
             self.state = PossessiveFilterState.HANDLE_1_2_POSSESSIVES
@@ -193,9 +193,8 @@ class PossessiveFilterDFA:
                 if pron_person in {'1per', '2per'}:
                     personal_pron_candidates = []
                     for cand in self.candidates:
-                        if cand['pos'] == 'NPRO' and cand['normalized'] in first_and_second_person_prons:
-                            cand_person = self.morph.parse(cand['word'])[0].tag.person
-                            if cand_person == pron_person:
+                        if cand.pos == 'NPRO' and cand.normalized in first_and_second_person_prons:
+                            if cand.person == pron_person:
                                 personal_pron_candidates.append(cand)
                     if personal_pron_candidates:
                         self.filtered = personal_pron_candidates
@@ -207,7 +206,7 @@ class PossessiveFilterDFA:
 
         if self.state == PossessiveFilterState.FALLBACK_PRONOUNS:
             if not self.filtered:
-                pron_candidates = [cand for cand in self.candidates if cand['pos'] == 'NPRO']
+                pron_candidates = [cand for cand in self.candidates if cand.pos == 'NPRO']
                 if pron_candidates:
                     self.filtered = pron_candidates
             self.state = PossessiveFilterState.DONE
@@ -224,10 +223,26 @@ class PossessiveFilterDFA:
         return self.filtered
 
 
-def filter_possessive_candidates(candidates, pronoun, morph, sentence_text):
-    dfa = PossessiveFilterDFA(candidates, pronoun, morph, sentence_text)
+def filter_possessive_candidates(candidates, pronoun, morph, sentence_text, doc=None, span=None):
+    dfa = PossessiveFilterDFA(candidates, pronoun, morph, sentence_text, doc, span)
     return dfa.run()
 
+RELATIVE_KINDS = (
+    (frozenset({'кто', 'кого', 'кому', 'кем', 'ком'}), 'animate'),
+    (frozenset({'что', 'чего', 'чем', 'чему', 'которое'}), 'inanimate'),
+    (frozenset({'который', 'которая', 'которого', 'которую', 'которым', 'котором', 'которой', 'которому'}), 'agreeing'),
+    (frozenset({'которые', 'которых', 'которыми'}), 'plural'),
+    (frozenset({'чей', 'чья', 'чьего', 'чьей', 'чьим', 'чьему', 'чьи', 'чьих', 'чьими'}), 'possessive'),
+)
+
+
+def relative_kind(norm_pron):
+    for forms, kind in RELATIVE_KINDS:
+        if norm_pron in forms:
+            return kind
+    return None
+
+
 class RelativeFilterState:
     START = 'START'
     PREPARE = 'PREPARE'
@@ -236,13 +251,18 @@ class RelativeFilterState:
 
 
 class RelativeFilterDFA:
-    def __init__(self, candidates, pronoun, morph, sentence_text):
+    def __init__(self, candidates, pronoun, morph, sentence_text, doc=None, span: Optional[Tuple[int, int]] = None):
         self.candidates = list(candidates or [])
         self.pronoun = pronoun
         self.morph = morph
         self.sentence_text = sentence_text
+        self.doc = doc or DocumentAnalysis(sentence_text)
         self.state = RelativeFilterState.START
         self.norm_pron = None
+        self.span = span
+        self.kind = None
+        self.pron_gender = None
+        self.pron_number = None
         self.comma_index = -1
         self.next_word = None
         self.filtered: List[Dict] = []
@@ -250,73 +270,58 @@ class RelativeFilterDFA:
     def _is_next_word_verb(self, word):
         if not word:
             return False
-        parsed = self.morph.parse(word)[0]
-        return 'VERB' in parsed.tag or 'INFN' in parsed.tag
+        parsed = analyze(word)
+        return parsed.pos in ('VERB', 'INFN')
+
+    def _matches(self, cand) -> bool:
+        if cand.pos != 'NOUN':
+            return False
+        if self.kind == 'possessive':
+            return True
+        if self.kind == 'animate':
+            return cand.animate
+        if self.kind == 'inanimate':
+            return not cand.animate
+        return cand.has_number(self.pron_number) and (not cand.genders or cand.matches_gender(self.pron_gender))
+
+    def _agrees_plural(self, cand) -> bool:
+        if cand.is_group:
+            return cand.has_number(self.pron_number)
+        return cand.genders == gender_mask(self.pron_gender) and cand.has_number(self.pron_number)
 
     def step(self) -> bool:
         if self.state == RelativeFilterState.START:
             self.norm_pron = (self.pronoun or '').lower()
-            self.state = RelativeFilterState.PREPARE
+            self.kind = relative_kind(self.norm_pron)
+            self.state = RelativeFilterState.PREPARE if self.kind else RelativeFilterState.DONE
             return True
 
         if self.state == RelativeFilterState.PREPARE:
-            pronoun_pos = self.sentence_text.lower().find(self.pronoun)
+            if self.span is not None:
+                pronoun_token = self.doc.token_at(self.span[0])
+            else:
+                pronoun_token = next((t for t in self.doc.tokens if t.text.lower() == self.norm_pron), None)
+            pronoun_pos = pronoun_token.start if pronoun_token is not None else -1
             self.comma_index = self.sentence_text.rfind(',', 0, pronoun_pos)
-            after_pronoun_pos = pronoun_pos + len(self.pronoun)
-            match_next_word = re.search(r'\b[а-яёА-ЯЁ]+\b', self.sentence_text[after_pronoun_pos:])
-            if match_next_word:
-                self.next_word = match_next_word.group(0)
+            if pronoun_token is not None:
+                next_token = pronoun_token.next_word()
+                self.next_word = next_token.text if next_token is not None else None
+            if self.kind in ('agreeing', 'plural'):
+                parsed_pron = analyze(self.pronoun)
+                self.pron_gender = parsed_pron.gender
+                self.pron_number = parsed_pron.number
             self.state = RelativeFilterState.SCAN_CANDIDATES
+            if self.kind in ('animate', 'inanimate') and not self._is_next_word_verb(self.next_word):
+                self.state = RelativeFilterState.DONE
             return True
 
         if self.state == RelativeFilterState.SCAN_CANDIDATES:
-            for cand in reversed(self.candidates):
-                if cand.get('start', -1) > self.comma_index:
-                    continue
-                pos = cand.get('pos')
-                if self.norm_pron in {'кто', 'кого', 'кому', 'кем', 'ком'}:
-                    if not self._is_next_word_verb(self.next_word):
-                        continue
-                    if pos == 'NOUN':
-                        parsed = self.morph.parse(cand['word'])[0]
-                        if 'anim' in parsed.tag:
-                            self.filtered = [cand]
-                            break
-                elif self.norm_pron in {'что', 'чего', 'чем', 'чему', 'которое'}:
-                    if not self._is_next_word_verb(self.next_word):
-                        continue
-                    if pos == 'NOUN':
-                        parsed = self.morph.parse(cand['word'])[0]
-                        if 'inan' in parsed.tag:
-                            self.filtered = [cand]
-                            break
-                elif self.norm_pron in {'который', 'которая', 'которого', 'которую', 'которым', 'котором', 'которой', 'которому'}:
-                    parsed_pron = self.morph.parse(self.pronoun)[0]
-                    if pos == 'NOUN':
-                        parsed_c = self.morph.parse(cand['word'])[0]
-                        if (parsed_c.tag.number == parsed_pron.tag.number and
-                            (parsed_c.tag.gender == parsed_pron.tag.gender or parsed_c.tag.gender is None)):
-                            self.filtered = [cand]
-                            break
-                elif self.norm_pron in {'которые', 'которых', 'которыми', 'которым'}:
-                    parsed_pron = self.morph.parse(self.pronoun)[0]
-                    pron_number = parsed_pron.tag.number
-                    suitable_candidates = []
-                    for c in self.candidates:
-                        is_group = c.get('is_group', False)
-                        parsed_c = self.morph.parse(c['word'])[0]
-                        if is_group:
-                            if c.get('number') == pron_number:
-                                suitable_candidates.append(c)
-                        else:
-                            if (parsed_c.tag.gender == parsed_pron.tag.gender and
-                                parsed_c.tag.number == pron_number):
-                                suitable_candidates.append(c)
-                    if suitable_candidates:
-                        self.filtered = suitable_candidates
-                        break
-                elif self.norm_pron in {'чей', 'чья', 'чьего', 'чьей', 'чьим', 'чьему', 'чьи', 'чьих', 'чьими', 'чьим'}:
-                    if pos == 'NOUN':
+            if self.kind == 'plural':
+                if any(cand.start <= self.comma_index for cand in self.candidates):
+                    self.filtered = [cand for cand in self.candidates if self._agrees_plural(cand)]
+            else:
+                for cand in reversed(self.candidates):
+                    if cand.start <= self.comma_index and self._matches(cand):
                         self.filtered = [cand]
                         break
             self.state = RelativeFilterState.DONE
@@ -333,20 +338,19 @@ class RelativeFilterDFA:
         return self.filtered
 
 
-def filter_relative_candidates(candidates, pronoun, morph, sentence_text):
-    dfa = RelativeFilterDFA(candidates, pronoun, morph, sentence_text)
+def filter_relative_candidates(candidates, pronoun, morph, sentence_text, doc=None, span=None):
+    dfa = RelativeFilterDFA(candidates, pronoun, morph, sentence_text, doc, span)
     return dfa.run()
 
-def contains_idiom_with_pronoun(pronoun, text, idioms):
+def contains_idiom_with_pronoun(pronoun, text, idioms=None, doc=None):
     pronoun_norm = normalize_word(pronoun)
-    from nltk.tokenize import sent_tokenize
-    sentences = sent_tokenize(text, language='russian')
-    for sentence in sentences:
-        if pronoun_norm in normalize_word(sentence):
-            sentence_no_commas = re.sub(r',', '', sentence)
-            sentence_norm = normalize_word(sentence_no_commas)
-            for idiom in idioms:
-                if idiom in sentence_norm and pronoun_norm in idiom:
-                    return True
+    doc = doc or DocumentAnalysis(text)
+    if idioms is None:
+        spans = doc.idiom_spans
+    else:
+        spans = IdiomSpans(IdiomMatcher(idioms).find(doc.tokens))
+    for start, end, _ in spans.spans:
+        for token in doc.tokens_between(start, end):
+            if normalize_word(token.text) == pronoun_norm:
+                return True
     return False
-
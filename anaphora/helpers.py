@@ -1,140 +1,154 @@
 import re
-from nltk.tokenize import word_tokenize
-from .morph import morph, get_pos
+from bisect import bisect_left, bisect_right
+from typing import List, NamedTuple
+from .morph import analyze
+from .speech import SpeechIndex
+from .vocative import VocativeIndex
 
 def smart_capitalize(original, normal):
     if original and original[0].isupper():
         return normal.capitalize()
     return normal
 
-def find_coord_groups(sentence):
-    patterns = [
-        r'((?:и\s+[А-ЯЁа-яё]+\s*,\s*)+(и\s+[А-ЯЁа-яё]+))',
-        r'((?:[А-ЯЁа-яё]+,\s*)+[А-ЯЁа-яё]+\s+и\s+[А-ЯЁа-яё]+)',
-        r'([А-ЯЁа-яё]+\s+и\s+[А-ЯЁа-яё]+)',
-        r'((?:[А-ЯЁа-яё]+,\s+)+[А-ЯЁа-яё]+)',
-        r'([А-ЯЁа-яё]+\s+с\s+[А-ЯЁа-яё]+)',
-    ]
+class CoordGroup(NamedTuple):
+    start: int
+    end: int
+    rank: int
+    names: List[str]
+
+CYRILLIC_RUN_PATTERN = re.compile(r'[А-ЯЁа-яё]+')
+
+def _is_space(sep):
+    return sep != '' and sep.isspace()
+
+def _is_tight_comma(sep):
+    return sep[:1] == ',' and (len(sep) == 1 or sep[1:].isspace())
+
+def _is_spaced_comma(sep):
+    return sep[:1] == ',' and len(sep) > 1 and sep[1:].isspace()
+
+def _is_loose_comma(sep):
+    return sep.strip() == ','
+
+def _conjunction_pairs(words, space, conjunction):
+    n = len(words)
+    k = 0
+    while k + 2 < n:
+        if space[k] and words[k + 1] == conjunction and space[k + 1]:
+            yield k, k + 2
+            k += 3
+        else:
+            k += 1
+
+def _comma_lists(words, spaced_comma):
+    n = len(words)
+    k = 0
+    while k < n:
+        j = k
+        while j + 1 < n and spaced_comma[j]:
+            j += 1
+        if j > k:
+            yield k, j
+        k = j + 1
+
+def _comma_lists_with_i(words, tight_comma, space):
+    n = len(words)
+    k = 0
+    while k < n:
+        j = k
+        while j + 1 < n and tight_comma[j]:
+            j += 1
+        if j > k and j + 2 < n and space[j] and words[j + 1] == 'и' and space[j + 1]:
+            yield k, j + 2
+            k = j + 3
+        else:
+            k = j + 1
+
+def _repeated_i(words, loose_comma, space):
+    n = len(words)
+    k = 0
+    while k + 1 < n:
+        if words[k].endswith('и') and space[k]:
+            last = k + 1
+            pairs = 1
+            while last + 2 < n and loose_comma[last] and words[last + 1] == 'и' and space[last + 1]:
+                last += 2
+                pairs += 1
+            if pairs > 1:
+                yield k, last
+                k = last + 1
+                continue
+        k += 1
+
+def _overlaps(starts, ends, start, end):
+    i = bisect_right(starts, start) - 1
+    if i >= 0 and ends[i] >= end:
+        return True
+    i = bisect_left(starts, start)
+    return i < len(starts) and ends[i] <= end
+
+def find_coord_group_spans(sentence, offset=0) -> List[CoordGroup]:
+    runs = list(CYRILLIC_RUN_PATTERN.finditer(sentence))
+    words = [m.group() for m in runs]
+    seps = [sentence[runs[i].end():runs[i + 1].start()] for i in range(len(runs) - 1)]
+    space = [_is_space(sep) for sep in seps]
+    matchers = (
+        lambda: _repeated_i(words, [_is_loose_comma(sep) for sep in seps], space),
+        lambda: _comma_lists_with_i(words, [_is_tight_comma(sep) for sep in seps], space),
+        lambda: _conjunction_pairs(words, space, 'и'),
+        lambda: _comma_lists(words, [_is_spaced_comma(sep) for sep in seps]),
+        lambda: _conjunction_pairs(words, space, 'с'),
+    )
     results = []
-    spans = []
-    for pattern in patterns:
-        for match in re.finditer(pattern, sentence):
-            start, end = match.start(), match.end()
-            if any(s <= start and e >= end or start <= s and end >= e for s, e in spans):
+    starts = []
+    ends = []
+    for rank, matcher in enumerate(matchers):
+        for first, last in matcher():
+            start = runs[first].end() - 1 if rank == 0 else runs[first].start()
+            end = runs[last].end()
+            if _overlaps(starts, ends, start, end):
                 continue
-            group = match.group()
-            tokens = word_tokenize(group, language='russian')
             names = []
-            i = 0
-            while i < len(tokens):
-                w = tokens[i]
-                norm = morph.parse(w)[0].normal_form
-                pos = morph.parse(w)[0].tag.POS
-                if pos == 'NOUN':
-                    names.append(smart_capitalize(w, norm))
-                if w.lower() in {'и', 'или', 'с'} and i + 1 < len(tokens):
-                    i += 1
-                    continue
-                i += 1
+            for i in range(first, last + 1):
+                w = sentence[start:runs[i].end()] if i == first else words[i]
+                parsed = analyze(w)
+                if parsed.pos == 'NOUN':
+                    names.append(smart_capitalize(w, parsed.normal_form))
             if len(names) > 1:
-                results.append(names)
-                spans.append((start, end))
+                results.append(CoordGroup(offset + start, offset + end, rank, names))
+                i = bisect_left(starts, start)
+                starts.insert(i, start)
+                ends.insert(i, end)
     return results
 
+def find_coord_groups(sentence):
+    return [group.names for group in find_coord_group_spans(sentence)]
+
 def find_addressed_entity(pronoun, sentence):
     norm_pronoun = pronoun.lower()
     match = re.search(r'\b' + re.escape(norm_pronoun) + r'\b', sentence.lower())
     if not match:
         return None
-    start_pos = match.end()
-    pattern = r',\s*([А-ЯЁа-яё]+(?:\s+[А-ЯЁа-яё]+)*)\s*,'
-    for m in re.finditer(pattern, sentence[start_pos:]):
-        addressed = m.group(1).strip()
-        words = addressed.split()
-        has_noun = False
-        for w in words:
-            pos = get_pos(w)
-            if pos == 'NOUN':
-                has_noun = True
-                break
-        if has_noun:
-            return addressed
-    return None
+    vocative = VocativeIndex(sentence).after(match.end())
+    return vocative.text if vocative is not None else None
 
 def get_speaker_context(pronoun, text, pronoun_pos):
-    norm_pronoun = pronoun.lower()
-    quotes_pattern = r'«[^«»]*?»|\"[^\"]*?\"'
-    speeches = list(re.finditer(quotes_pattern, text))
-    if pronoun_pos is not None and pronoun_pos != -1:
-        for s in speeches:
-            if s.start() <= pronoun_pos < s.end():
-                before = text[:s.start()].strip()
-                after = text[s.end():].strip()
-                before_author_match = re.search(r'([А-ЯЁа-яё]+\s+[А-ЯЁа-яё]+|[А-ЯЁа-яё]+)\s*[:,-]\s*$', before)
-                if before_author_match:
-                    candidate = before_author_match.group(1).strip()
-                    words = re.findall(r'[А-ЯЁа-яё]+', candidate)
-                    if words:
-                        last_two = words[-2:] if len(words) >= 2 else words
-                        name_parts = []
-                        for w in last_two:
-                            if get_pos(w) == 'NOUN':
-                                name_parts.append(w)
-                        if name_parts:
-                            return " ".join(name_parts)
-                    return candidate
-                tail = re.sub(r'^[\s,.\-–—]+', '', after)
-                tokens = re.findall(r'[А-ЯЁа-яё]+', tail)
-                i = 0
-                while i < len(tokens) and get_pos(tokens[i]) != 'NOUN':
-                    i += 1
-                if i < len(tokens):
-                    name_parts = [tokens[i]]
-                    if i + 1 < len(tokens) and get_pos(tokens[i + 1]) == 'NOUN':
-                        name_parts.append(tokens[i + 1])
-                    return " ".join(name_parts)
-                return None
-    lines = text.split('\n')
-    pronoun_in_speech_line = False
-    for line in lines:
-        if line.strip().startswith('-') and norm_pronoun in line.lower():
-            pronoun_in_speech_line = True
-            break
-    if pronoun_in_speech_line:
-        for i, line in enumerate(lines):
-            if line.strip().startswith('-') and norm_pronoun in line.lower():
-                for j in range(i - 1, -1, -1):
-                    author_line = lines[j].strip()
-                    if author_line and not author_line.startswith('-'):
-                        author_part = author_line.split(',', 1)
-                        if len(author_part) == 2:
-                            return author_part[1].strip()
-                        else:
-                            return author_line
-    return None
+    return SpeechIndex(text).speaker_at(pronoun_pos)
 
 def get_attribution_entities(pronoun, text, pronoun_pos):
-    norm_pronoun = pronoun.lower() if pronoun else ''
-    quotes_pattern = r'«[^«»]*?»|\"[^\"]*?\"'
-    entities = []
-    speeches = list(re.finditer(quotes_pattern, text))
-    if pronoun_pos is not None and pronoun_pos != -1:
-        for s in speeches:
-            if s.start() <= pronoun_pos < s.end():
-                after = text[s.end():]
-                tokens = re.findall(r'[А-ЯЁа-яё]+', after)
-                for w in tokens:
-                    if get_pos(w) == 'NOUN':
-                        entities.append(w)
-                break
-    return entities
-
-def is_subject_simple(word, sentence, morph):
+    return SpeechIndex(text).attribution_at(pronoun_pos)
+
+def is_subject_at(parsed, position, sentence_length):
+    if parsed.pos not in ('NOUN', 'NPRO') or parsed.case != 'nomn':
+        return False
+    return position < sentence_length / 3
+
+def is_subject_simple(word, sentence, morph=None):
     normalized_word = word.lower().replace('ё', 'е')
-    parsed = morph.parse(word)[0]
-    if parsed.tag.POS not in ['NOUN', 'NPRO']:
+    parsed = analyze(word)
+    if parsed.pos not in ['NOUN', 'NPRO']:
         return False
-    if 'nomn' not in str(parsed.tag.case):
+    if 'nomn' not in str(parsed.case):
         return False
     sentence_lower = sentence.lower().replace('ё', 'е')
     word_position = sentence_lower.find(normalized_word)
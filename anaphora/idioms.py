@@ -0,0 +1,77 @@
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+from .morph import normalize_word
+from .resources import get_lexicon
+from .tokenization import Token, tokenize
+
+IdiomSpan = Tuple[int, int, str]
+
+_TERMINAL = ''
+
+
+class IdiomMatcher:
+    def __init__(self, idioms: Iterable[str]):
+        self.root: Dict[str, dict] = {}
+        self.size = 0
+        for idiom in idioms:
+            self.add(idiom)
+
+    def add(self, idiom: str):
+        words = [normalize_word(t.text) for t in tokenize(idiom)]
+        if not words:
+            return
+        node = self.root
+        for word in words:
+            node = node.setdefault(word, {})
+        if _TERMINAL not in node:
+            self.size += 1
+        node[_TERMINAL] = idiom
+
+    def find(self, tokens: List[Token]) -> List[IdiomSpan]:
+        spans = []
+        root = self.root
+        for first in tokens:
+            node = root.get(normalize_word(first.text))
+            token = first
+            while node is not None:
+                idiom = node.get(_TERMINAL)
+                if idiom is not None:
+                    spans.append((first.start, token.end, idiom))
+                token = token.next
+                if token is None:
+                    break
+                node = node.get(normalize_word(token.text))
+        return spans
+
+
+class IdiomSpans:
+    def __init__(self, spans: List[IdiomSpan]):
+        self.spans = spans
+        self.starts: List[int] = []
+        self.ends: List[int] = []
+        for start, end, _ in sorted(spans):
+            if self.ends and start <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def covers(self, start: int, end: int) -> bool:
+        i = bisect_right(self.starts, start) - 1
+        return i >= 0 and end <= self.ends[i]
+
+    def __bool__(self):
+        return bool(self.spans)
+
+
+_matcher: Optional[IdiomMatcher] = None
+_matcher_source = None
+
+
+def get_idiom_matcher() -> IdiomMatcher:
+    global _matcher, _matcher_source
+    idioms = get_lexicon().idioms
+    if _matcher is None or _matcher_source is not idioms:
+        _matcher = IdiomMatcher(idioms)
+        _matcher_source = idioms
+    return _matcher
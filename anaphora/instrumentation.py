@@ -0,0 +1,116 @@
+import json
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+TimerKey = Tuple[str, str]
+
+_active: Optional['Metrics'] = None
+
+
+class Metrics:
+    def __init__(self):
+        self.timers: Dict[TimerKey, list] = {}
+        self.counters: Dict[str, int] = {}
+        self.maxima: Dict[str, float] = {}
+
+    def add_time(self, group: str, label: str, seconds: float):
+        timer = self.timers.get((group, label))
+        if timer is None:
+            self.timers[(group, label)] = [1, seconds, seconds]
+        else:
+            timer[0] += 1
+            timer[1] += seconds
+            if seconds > timer[2]:
+                timer[2] = seconds
+
+    @contextmanager
+    def timer(self, group: str, label: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(group, label, time.perf_counter() - started)
+
+    def incr(self, name: str, value: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe_max(self, name: str, value: float):
+        if name not in self.maxima or value > self.maxima[name]:
+            self.maxima[name] = value
+
+    def merge(self, other: 'Metrics'):
+        for (group, label), (count, total, peak) in other.timers.items():
+            timer = self.timers.setdefault((group, label), [0, 0.0, 0.0])
+            timer[0] += count
+            timer[1] += total
+            timer[2] = max(timer[2], peak)
+        for name, value in other.counters.items():
+            self.incr(name, value)
+        for name, value in other.maxima.items():
+            self.observe_max(name, value)
+
+    def reset(self):
+        self.timers.clear()
+        self.counters.clear()
+        self.maxima.clear()
+
+    def as_dict(self) -> dict:
+        timings: Dict[str, dict] = {}
+        for (group, label), (count, total, peak) in sorted(self.timers.items()):
+            timings.setdefault(group, {})[label] = {'count': count, 'total_s': total, 'max_s': peak}
+        return {'timings': timings, 'counters': dict(sorted(self.counters.items())),
+                'maxima': dict(sorted(self.maxima.items()))}
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.as_dict(), ensure_ascii=False, **kwargs)
+
+    def to_prometheus(self, prefix: str = 'anaphora') -> str:
+        lines = []
+        groups = sorted({group for group, _ in self.timers})
+        for group in groups:
+            items = sorted((label, timer) for (g, label), timer in self.timers.items() if g == group)
+            for suffix, kind, column in (('seconds_total', 'counter', 1), ('calls_total', 'counter', 0),
+                                         ('seconds_max', 'gauge', 2)):
+                name = f"{prefix}_{group}_{suffix}"
+                lines.append(f"# TYPE {name} {kind}")
+                for label, timer in items:
+                    lines.append(f'{name}{{{group}="{label}"}} {timer[column]}')
+        for name, value in sorted(self.counters.items()):
+            metric = f"{prefix}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        for name, value in sorted(self.maxima.items()):
+            metric = f"{prefix}_{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def active() -> Optional[Metrics]:
+    return _active
+
+
+def enable(metrics: Optional[Metrics] = None) -> Metrics:
+    global _active
+    _active = metrics if metrics is not None else Metrics()
+    return _active
+
+
+def disable() -> Optional[Metrics]:
+    global _active
+    metrics, _active = _active, None
+    return metrics
+
+
+@contextmanager
+def instrument(metrics: Optional[Metrics] = None):
+    previous = _active
+    current = enable(metrics)
+    try:
+        yield current
+    finally:
+        if previous is not None:
+            enable(previous)
+        else:
+            disable()
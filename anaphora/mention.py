@@ -0,0 +1,99 @@
+import sys
+from typing import Optional
+from .morph import WordAnalysis, analyze
+
+MASC = 1
+FEMN = 2
+NEUT = 4
+ALL_GENDERS = MASC | FEMN | NEUT
+SING = 1
+PLUR = 2
+
+GENDER_BITS = {'masc': MASC, 'femn': FEMN, 'neut': NEUT, 'ms-f': MASC | FEMN, 'GNdr': ALL_GENDERS}
+NUMBER_BITS = {'sing': SING, 'plur': PLUR}
+
+VY_FORMS = {'вы', 'вас', 'вам', 'вами'}
+
+
+def gender_mask(gender: Optional[str]) -> int:
+    return GENDER_BITS.get(gender, 0) if gender else 0
+
+
+def number_mask(number: Optional[str]) -> int:
+    return NUMBER_BITS.get(number, 0) if number else 0
+
+
+class Mention:
+    __slots__ = ('word', 'start', 'end', 'pos', 'normalized', 'genders', 'numbers', 'is_group', 'subject',
+                 'animate', 'person', 'clause', 'clause_subject', 'topic')
+
+    def __init__(self, word: str, start: int, end: int, pos: Optional[str], normalized: str,
+                 genders: int = 0, numbers: int = 0, is_group: bool = False, subject: bool = False,
+                 animate: bool = False, person: Optional[str] = None, clause: int = -1,
+                 clause_subject: bool = False, topic: bool = False):
+        self.word = word
+        self.start = start
+        self.end = end
+        self.pos = pos
+        self.normalized = sys.intern(normalized)
+        self.genders = genders
+        self.numbers = numbers
+        self.is_group = is_group
+        self.subject = subject
+        self.animate = animate
+        self.person = person
+        self.clause = clause
+        self.clause_subject = clause_subject
+        self.topic = topic
+
+    @classmethod
+    def from_token(cls, word: str, start: int, end: int, parsed: WordAnalysis, normalized: str,
+                   common_gender: bool = False, collective: bool = False,
+                   subject: bool = False, clause: int = -1, clause_subject: bool = False,
+                   topic: bool = False) -> 'Mention':
+        genders = gender_mask(parsed.gender)
+        numbers = number_mask(parsed.number)
+        if normalized in VY_FORMS:
+            genders = 0
+            numbers = SING | PLUR
+        elif common_gender:
+            genders = MASC | FEMN
+        elif collective:
+            numbers = SING | PLUR
+        return cls(word, start, end, parsed.pos, normalized, genders, numbers, subject=subject,
+                   animate=parsed.animacy == 'anim', person=parsed.person, clause=clause,
+                   clause_subject=clause_subject, topic=topic)
+
+    @classmethod
+    def entity(cls, word: str, gender: Optional[str] = None, number: Optional[str] = None,
+               is_group: bool = False) -> 'Mention':
+        return cls(word, -1, -1, 'NOUN', word.lower(), gender_mask(gender), number_mask(number), is_group,
+                   animate=analyze(word).animacy == 'anim')
+
+    def with_word(self, word: str) -> 'Mention':
+        return Mention(word, self.start, self.end, self.pos, self.normalized, self.genders, self.numbers,
+                       self.is_group, self.subject, self.animate, self.person, self.clause, self.clause_subject,
+                       self.topic)
+
+    @property
+    def signature(self) -> tuple:
+        return self.pos, self.genders, self.numbers, self.is_group, self.animate, self.person
+
+    @property
+    def has_offsets(self) -> bool:
+        return self.start >= 0
+
+    def has_number(self, number: Optional[str]) -> bool:
+        return bool(self.numbers & number_mask(number))
+
+    def matches_number(self, number: Optional[str]) -> bool:
+        return number is None or bool(self.numbers & number_mask(number))
+
+    def matches_gender(self, gender: Optional[str]) -> bool:
+        return gender is None or bool(self.genders & gender_mask(gender))
+
+    def agrees(self, gender: Optional[str], number: Optional[str]) -> bool:
+        return self.matches_gender(gender) and self.matches_number(number)
+
+    def __repr__(self):
+        return f"Mention({self.word!r}, {self.start}, {self.end}, {self.pos!r})"
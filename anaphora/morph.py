@@ -1,13 +1,72 @@
+import os
+import warnings
+from functools import lru_cache
+from typing import NamedTuple, Optional
 import pymorphy3
 
 morph = pymorphy3.MorphAnalyzer()
 
+def _cache_size_from_env(default: int = 65536) -> int:
+    value = os.environ.get('ANAPHORA_MORPH_CACHE_SIZE', '').strip()
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        warnings.warn(f"ANAPHORA_MORPH_CACHE_SIZE={value!r} is not an integer, using {default}")
+        return default
+
+
+DEFAULT_CACHE_SIZE = _cache_size_from_env()
+
+
+class WordAnalysis(NamedTuple):
+    pos: Optional[str]
+    gender: Optional[str]
+    number: Optional[str]
+    case: Optional[str]
+    animacy: Optional[str]
+    person: Optional[str]
+    normal_form: str
+
+
+def _analyze(word: str) -> WordAnalysis:
+    p = morph.parse(word)[0]
+    tag = p.tag
+    return WordAnalysis(tag.POS, tag.gender, tag.number, tag.case, tag.animacy, tag.person, p.normal_form)
+
+
+def _tag_pos(word: str) -> Optional[str]:
+    return morph.tag(word)[0].POS
+
+
+_cached_analyze = lru_cache(maxsize=DEFAULT_CACHE_SIZE)(_analyze)
+_cached_pos = lru_cache(maxsize=DEFAULT_CACHE_SIZE)(_tag_pos)
+
+
+def analyze(word: str) -> WordAnalysis:
+    return _cached_analyze(word)
+
+
+def set_cache_size(maxsize: Optional[int]):
+    global _cached_analyze, _cached_pos
+    _cached_analyze = lru_cache(maxsize=maxsize)(_analyze)
+    _cached_pos = lru_cache(maxsize=maxsize)(_tag_pos)
+
+
+def cache_info():
+    return {'analyze': _cached_analyze.cache_info(), 'pos': _cached_pos.cache_info()}
+
+
+def clear_cache():
+    _cached_analyze.cache_clear()
+    _cached_pos.cache_clear()
+
+
 def get_pos(word):
     if word is None:
         return None
-    p = morph.parse(word)[0]
-    return p.tag.POS
+    return _cached_pos(word)
 
 def normalize_word(word: str) -> str:
     return word.lower().replace('ё', 'е')
-
@@ -1,56 +1,47 @@
 from typing import Optional
 from .morph import get_pos, normalize_word
-from .resources import (
-    personal_pronouns,
-    possessive_pronouns,
-    ambiguous_pronouns,
-    reflexive_pronouns,
-    relative_pronouns,
-    demonstrative_pronouns,
-)
+from .resources import get_lexicon
 
 
 class PronounTypeState:
     START = "START"
-    NORMALIZE = "NORMALIZE"
-    CHECK_AMBIGUOUS = "CHECK_AMBIGUOUS"
+    LOOKUP = "LOOKUP"
     DISAMBIGUATE_BY_NEXT_POS = "DISAMBIGUATE_BY_NEXT_POS"
-    CHECK_PERSONAL = "CHECK_PERSONAL"
-    CHECK_POSSESSIVE = "CHECK_POSSESSIVE"
-    CHECK_REFLEXIVE = "CHECK_REFLEXIVE"
-    CHECK_DEMONSTRATIVE = "CHECK_DEMONSTRATIVE"
-    CHECK_RELATIVE = "CHECK_RELATIVE"
     DONE = "DONE"
 
 
 class PronounTypeDFA:
-    def __init__(self, word: str, next_word: Optional[str]):
+    def __init__(self, word: str, next_word: Optional[str] = None, doc=None, end: Optional[int] = None):
         self.original_word = word
         self.next_word = next_word
-        self.word_norm: Optional[str] = None
+        self.doc = doc
+        self.end = end
         self.next_pos: Optional[str] = None
         self.result_type: Optional[str] = None
+        self.lexicon = get_lexicon()
         self.state: str = PronounTypeState.START
 
     def step(self) -> bool:
         if self.state == PronounTypeState.START:
-            self.state = PronounTypeState.NORMALIZE
+            self.state = PronounTypeState.LOOKUP
             return True
 
-        if self.state == PronounTypeState.NORMALIZE:
-            self.word_norm = normalize_word(self.original_word)
-            self.next_pos = get_pos(self.next_word)
-            self.state = PronounTypeState.CHECK_AMBIGUOUS
-            return True
-
-        if self.state == PronounTypeState.CHECK_AMBIGUOUS:
-            if self.word_norm in ambiguous_pronouns:
+        if self.state == PronounTypeState.LOOKUP:
+            entry = self.lexicon.pronoun_types.get(normalize_word(self.original_word))
+            if entry is None:
+                self.state = PronounTypeState.DONE
+            elif entry.ambiguous:
                 self.state = PronounTypeState.DISAMBIGUATE_BY_NEXT_POS
             else:
-                self.state = PronounTypeState.CHECK_PERSONAL
+                self.result_type = entry.type
+                self.state = PronounTypeState.DONE
             return True
 
         if self.state == PronounTypeState.DISAMBIGUATE_BY_NEXT_POS:
+            if self.doc is not None:
+                self.next_pos = self.doc.next_word_pos(self.end)
+            else:
+                self.next_pos = get_pos(self.next_word)
             if self.next_pos == 'NOUN':
                 self.result_type = 'притяжательное'
             else:
@@ -58,49 +49,6 @@ class PronounTypeDFA:
             self.state = PronounTypeState.DONE
             return True
 
-        if self.state == PronounTypeState.CHECK_PERSONAL:
-            if self.word_norm in personal_pronouns:
-                self.result_type = 'личное'
-                self.state = PronounTypeState.DONE
-            else:
-                self.state = PronounTypeState.CHECK_POSSESSIVE
-            return True
-
-        if self.state == PronounTypeState.CHECK_POSSESSIVE:
-            if self.word_norm in possessive_pronouns:
-                self.result_type = 'притяжательное'
-                self.state = PronounTypeState.DONE
-            else:
-                self.state = PronounTypeState.CHECK_REFLEXIVE
-            return True
-
-        if self.state == PronounTypeState.CHECK_REFLEXIVE:
-            if self.word_norm in reflexive_pronouns:
-                self.result_type = 'возвратное'
-                self.state = PronounTypeState.DONE
-            else:
-                self.state = PronounTypeState.CHECK_DEMONSTRATIVE
-            return True
-
-        if self.state == PronounTypeState.CHECK_DEMONSTRATIVE:
-            if self.word_norm in demonstrative_pronouns:
-                self.result_type = 'указательное'
-                self.state = PronounTypeState.DONE
-            else:
-                self.state = PronounTypeState.CHECK_RELATIVE
-            return True
-
-        if self.state == PronounTypeState.CHECK_RELATIVE:
-            if self.word_norm in relative_pronouns:
-                self.result_type = 'относительное'
-            else:
-                self.result_type = None
-            self.state = PronounTypeState.DONE
-            return True
-
-        if self.state == PronounTypeState.DONE:
-            return False
-
         return False
 
     def run(self) -> Optional[str]:
@@ -113,3 +61,7 @@ def determine_pronoun_type(word, next_word):
     dfa = PronounTypeDFA(word, next_word)
     return dfa.run()
 
+
+def pronoun_type_at(doc, start: int, end: int) -> Optional[str]:
+    dfa = PronounTypeDFA(doc.text[start:end], doc=doc, end=end)
+    return dfa.run()
@@ -1,28 +1,37 @@
-from .helpers import is_subject_simple
-
-def rank_candidates(candidates, pronoun_position, text, morph):
-    freq = {}
-    for cand in candidates:
-        word_norm = cand['normalized']
-        freq[word_norm] = freq.get(word_norm, 0) + 1
-    distances = []
-    for c in candidates:
-        start = c.get('start', -1)
-        if start >= 0:
-            dist = abs(pronoun_position - start)
-        else:
-            dist = float('inf')
-        distances.append(dist)
-    min_distance = min(distances) if distances else None
-    scored_candidates = []
-    for c, dist in zip(candidates, distances):
-        score = 0
-        if is_subject_simple(c['word'], text, morph):
-            score += 2
-        score += freq.get(c['normalized'], 0)
-        if min_distance is not None and dist == min_distance:
-            score += 2
-        scored_candidates.append((score, c))
-    scored_candidates.sort(key=lambda x: x[0], reverse=True)
-    return [c for score, c in scored_candidates]
+from collections import Counter
+from typing import List, NamedTuple, Optional, Sequence
+from .mention import Mention
 
+
+class RankingWeights(NamedTuple):
+    subject: float = 2
+    frequency: float = 1
+    nearest: float = 2
+    topic: float = 2
+
+
+DEFAULT_WEIGHTS = RankingWeights()
+
+
+def set_default_weights(weights: RankingWeights):
+    global DEFAULT_WEIGHTS
+    DEFAULT_WEIGHTS = weights
+
+
+def score_candidates(candidates: Sequence[Mention], pronoun_position: int,
+                     weights: Optional[RankingWeights] = None) -> List[float]:
+    w_subject, w_frequency, w_nearest, w_topic = weights or DEFAULT_WEIGHTS
+    freq = Counter(c.normalized for c in candidates)
+    distances = [abs(pronoun_position - c.start) if c.start >= 0 else float('inf') for c in candidates]
+    nearest = min(distances, default=None)
+    return [
+        w_subject * c.subject + w_topic * c.topic + w_frequency * freq[c.normalized]
+        + (w_nearest if dist == nearest else 0)
+        for c, dist in zip(candidates, distances)
+    ]
+
+
+def rank_candidates(candidates, pronoun_position, weights=None):
+    scores = score_candidates(candidates, pronoun_position, weights)
+    order = sorted(range(len(candidates)), key=scores.__getitem__, reverse=True)
+    return [candidates[i] for i in order]
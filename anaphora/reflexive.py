@@ -1,6 +1,7 @@
-from typing import Iterable, Optional, Union, List, Dict
-import re
-from .helpers import is_subject_simple
+from typing import Iterable, Optional, Union, List, Tuple
+from .document import DocumentAnalysis
+from .mention import Mention
+from .idioms import IdiomMatcher, IdiomSpans
 
 class ReflexiveFilterState:
     START = 'START'
@@ -13,63 +14,38 @@ class ReflexiveFilterState:
 
 
 class ReflexiveFilterDFA:
-    def __init__(self, candidates: Iterable[Dict], pronoun: str, morph, sentence_text: str, idioms: Optional[Iterable[str]] = None):
+    def __init__(self, candidates: Iterable[Mention], pronoun: str, morph, sentence_text: str, idioms: Optional[Iterable[str]] = None,
+                 doc: Optional[DocumentAnalysis] = None, span: Optional[Tuple[int, int]] = None):
         self.candidates = list(candidates or [])
         self.pronoun = pronoun
         self.morph = morph
         self.sentence_text = sentence_text or ""
-        self.idioms = list(idioms or [])
+        self.doc = doc or DocumentAnalysis(self.sentence_text)
+        if idioms is None:
+            self.idiom_spans = self.doc.idiom_spans
+        else:
+            self.idiom_spans = IdiomSpans(IdiomMatcher(idioms).find(self.doc.tokens))
         self.state = ReflexiveFilterState.START
-        self.sent_low = self.sentence_text.lower()
         self.pron_low = (self.pronoun or '').lower().strip()
+        self.span = span
         self.pron_start = -1
-        self.left_candidates: List[Dict] = []
-        self.right_candidates: List[Dict] = []
-        self.result: Optional[Union[Dict, List[Dict]]] = None
+        self.left_candidates: List[Mention] = []
+        self.right_candidates: List[Mention] = []
+        self.result: Optional[Union[Mention, List[Mention]]] = None
 
-    def _is_plural_token(self, candidate: Dict) -> bool:
-        if not candidate:
-            return False
-        num = candidate.get('number')
-        if num:
-            num_s = str(num).lower()
-            if any(x in num_s for x in ("plur", "pl", "plural", "мн")):
-                return True
-        if candidate.get("is_group"):
-            return True
-        if candidate.get("word", "").lower() in {"они", "мы", "вы"}:
-            return True
-        return False
+    def _is_plural_token(self, candidate: Mention) -> bool:
+        return _is_plural_token(candidate)
 
-    def _collect_subject_group_by_text(self, subject: Dict) -> List[Dict]:
-        if subject is None:
-            return []
-        group = [subject]
-        subj_start = subject.get("start", 0)
-        subj_end = subject.get("end", subj_start)
-        for c in self.candidates:
-            if c is subject:
-                continue
-            cstart = c.get("start", 0)
-            cend = c.get("end", cstart)
-            left, right = sorted((subj_end, cstart))
-            between = self.sentence_text[left:right].lower()
-            if re.search(r'\bи\b', between) or re.search(r',\s*и\b', between):
-                pos = (c.get("pos") or "").upper()
-                if pos in {"NOUN", "PROPN", "PRON"}:
-                    group.append(c)
-        group = sorted({id(x): x for x in group}.values(),
-                       key=lambda x: x.get("start", 0))
-        return group
+    def _collect_subject_group(self, subject: Mention) -> List[Mention]:
+        return _collect_subject_group(subject, self.candidates, self.doc)
 
     def _sort_by_closest_left(self, candidates_list):
         return sorted(candidates_list,
-                      key=lambda c: self.pron_start - c.get("end", c.get("start", 0)),
-                      reverse=True)
+                      key=lambda c: self.pron_start - c.end)
 
     def _sort_by_closest_right(self, candidates_list):
         return sorted(candidates_list,
-                      key=lambda c: c.get("start", 0) - self.pron_start)
+                      key=lambda c: c.start - self.pron_start)
 
     def step(self) -> bool:
         if self.state == ReflexiveFilterState.START:
@@ -77,22 +53,25 @@ class ReflexiveFilterDFA:
             return True
 
         if self.state == ReflexiveFilterState.PRECHECK_IDIOMS:
-            for idi in self.idioms:
-                if idi and idi.lower() in self.sent_low:
-                    self.result = None
-                    self.state = ReflexiveFilterState.DONE
-                    return True
+            if self.span is not None:
+                self.pron_start, pron_end = self.span
+            else:
+                self.pron_start = self.sentence_text.lower().find(self.pron_low)
+                pron_end = self.pron_start + len(self.pron_low)
+            if self.pron_start != -1 and self.idiom_spans.covers(self.pron_start, pron_end):
+                self.result = None
+                self.state = ReflexiveFilterState.DONE
+                return True
             self.state = ReflexiveFilterState.PREPARE
             return True
 
         if self.state == ReflexiveFilterState.PREPARE:
-            self.pron_start = self.sent_low.find(self.pron_low)
             if self.pron_start == -1:
                 self.result = None
                 self.state = ReflexiveFilterState.DONE
                 return True
-            self.left_candidates = [c for c in self.candidates if c.get("start", float("inf")) < self.pron_start]
-            self.right_candidates = [c for c in self.candidates if c.get("start", 0) > self.pron_start]
+            self.left_candidates = [c for c in self.candidates if c.start < self.pron_start]
+            self.right_candidates = [c for c in self.candidates if c.start > self.pron_start]
             self.state = ReflexiveFilterState.SPLIT_LEFT_RIGHT
             return True
 
@@ -102,8 +81,7 @@ class ReflexiveFilterDFA:
             plural_groups = []
             single_words = []
             for c in self.left_candidates:
-                word = c.get("word", "")
-                is_subject = word and is_subject_simple(word, self.sentence_text, self.morph)
+                is_subject = _is_subject(c)
                 is_plural = self._is_plural_token(c)
                 if is_plural and is_subject:
                     plural_subject_groups.append(c)
@@ -115,7 +93,7 @@ class ReflexiveFilterDFA:
                     single_words.append(c)
             if plural_subject_groups:
                 subject = self._sort_by_closest_left(plural_subject_groups)[0]
-                group = self._collect_subject_group_by_text(subject)
+                group = self._collect_subject_group(subject)
                 self.result = group if group else subject
                 self.state = ReflexiveFilterState.DONE
                 return True
@@ -126,13 +104,13 @@ class ReflexiveFilterDFA:
                 return True
             if plural_groups:
                 subject = self._sort_by_closest_left(plural_groups)[0]
-                group = self._collect_subject_group_by_text(subject)
+                group = self._collect_subject_group(subject)
                 self.result = group if group else subject
                 self.state = ReflexiveFilterState.DONE
                 return True
             if single_words:
                 nouns_pronouns = [c for c in single_words
-                                  if c.get("pos", "").upper() in {"NOUN", "PROPN", "PRON"}]
+                                  if (c.pos or "").upper() in {"NOUN", "PROPN", "PRON"}]
                 if nouns_pronouns:
                     self.result = self._sort_by_closest_left(nouns_pronouns)[0]
                 else:
@@ -149,8 +127,7 @@ class ReflexiveFilterDFA:
                 plural_groups_right = []
                 single_words_right = []
                 for c in self.right_candidates:
-                    word = c.get("word", "")
-                    is_subject = word and is_subject_simple(word, self.sentence_text, self.morph)
+                    is_subject = _is_subject(c)
                     is_plural = self._is_plural_token(c)
                     if is_plural and is_subject:
                         plural_subject_groups_right.append(c)
@@ -162,17 +139,17 @@ class ReflexiveFilterDFA:
                         single_words_right.append(c)
                 if plural_subject_groups_right:
                     subject = self._sort_by_closest_right(plural_subject_groups_right)[0]
-                    group = self._collect_subject_group_by_text(subject)
+                    group = self._collect_subject_group(subject)
                     self.result = group if group else subject
                 elif single_subjects_right:
                     self.result = self._sort_by_closest_right(single_subjects_right)[0]
                 elif plural_groups_right:
                     subject = self._sort_by_closest_right(plural_groups_right)[0]
-                    group = self._collect_subject_group_by_text(subject)
+                    group = self._collect_subject_group(subject)
                     self.result = group if group else subject
                 elif single_words_right:
                     nouns_pronouns = [c for c in single_words_right
-                                      if c.get("pos", "").upper() in {"NOUN", "PROPN", "PRON"}]
+                                      if (c.pos or "").upper() in {"NOUN", "PROPN", "PRON"}]
                     if nouns_pronouns:
                         self.result = self._sort_by_closest_right(nouns_pronouns)[0]
                     else:
@@ -185,54 +162,53 @@ class ReflexiveFilterDFA:
 
         return False
 
-    def run(self) -> Optional[Union[Dict, List[Dict]]]:
+    def run(self) -> Optional[Union[Mention, List[Mention]]]:
         while self.step():
             pass
         return self.result
 
-def _is_plural_token(candidate: Dict) -> bool:
+def _is_subject(candidate: Mention) -> bool:
+    return candidate.clause_subject if candidate.clause >= 0 else candidate.subject
+
+def _is_plural_token(candidate: Mention) -> bool:
     if not candidate:
         return False
-    num = candidate.get('number')
-    if num:
-        num_s = str(num).lower()
-        if any(x in num_s for x in ("plur", "pl", "plural", "мн")):
-            return True
-    if candidate.get("is_group"):
+    if candidate.has_number('plur'):
+        return True
+    if candidate.is_group:
         return True
-    if candidate.get("word", "").lower() in {"они", "мы", "вы"}:
+    if candidate.word.lower() in {"они", "мы", "вы"}:
         return True
     return False
 
-def _collect_subject_group_by_text(subject: Dict,
-                                   candidates: List[Dict],
-                                   sentence_text: str) -> List[Dict]:
+def _collect_subject_group(subject: Mention,
+                           candidates: List[Mention],
+                           doc: DocumentAnalysis) -> List[Mention]:
     if subject is None:
         return []
     group = [subject]
-    subj_start = subject.get("start", 0)
-    subj_end = subject.get("end", subj_start)
+    subj_end = subject.end
+    if subj_end < 0:
+        return group
     for c in candidates:
-        if c is subject:
+        if c is subject or c.start < 0:
             continue
-        cstart = c.get("start", 0)
-        cend = c.get("end", cstart)
-        left, right = sorted((subj_end, cstart))
-        between = sentence_text[left:right].lower()
-        if re.search(r'\bи\b', between) or re.search(r',\s*и\b', between):
-            pos = (c.get("pos") or "").upper()
+        if doc.has_conjunction(min(subj_end, c.start), max(subj_end, c.start)):
+            pos = (c.pos or "").upper()
             if pos in {"NOUN", "PROPN", "PRON"}:
                 group.append(c)
     group = sorted({id(x): x for x in group}.values(),
-                   key=lambda x: x.get("start", 0))
+                   key=lambda x: x.start)
     return group
 
-def filter_reflexive_candidates(candidates: Iterable[Dict],
+def filter_reflexive_candidates(candidates: Iterable[Mention],
                                 pronoun: str,
                                 morph,
                                 sentence_text: str,
-                                idioms: Optional[Iterable[str]] = None
-                                ) -> Optional[Union[Dict, List[Dict]]]:
-    dfa = ReflexiveFilterDFA(candidates, pronoun, morph, sentence_text, idioms)
+                                idioms: Optional[Iterable[str]] = None,
+                                doc: Optional[DocumentAnalysis] = None,
+                                span: Optional[Tuple[int, int]] = None
+                                ) -> Optional[Union[Mention, List[Mention]]]:
+    dfa = ReflexiveFilterDFA(candidates, pronoun, morph, sentence_text, idioms, doc, span)
     return dfa.run()
 
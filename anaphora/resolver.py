@@ -1,10 +1,161 @@
-import nltk
-from .dfa import AnaphoraDFA
-
-nltk.download('punkt', quiet=True)
-nltk.download('punkt_tab', quiet=True)
+import os
+import multiprocessing
+from collections import deque
+from typing import Iterable, Iterator, List, NamedTuple, Optional
+from .dfa import AnaphoraDFA, Annotation, render_annotations
+from .instrumentation import Metrics, instrument
+from .morph import analyze
+from .resources import get_lexicon
+from .tokenization import get_sentence_spans
 
 def resolve_pronouns(text):
     dfa = AnaphoraDFA(text)
     return dfa.run()
 
+def resolve_pronouns_structured(text):
+    dfa = AnaphoraDFA(text)
+    return dfa.run_structured()
+
+def resolve_pronouns_instrumented(text, metrics: Optional[Metrics] = None):
+    with instrument(metrics) as current:
+        result = resolve_pronouns(text)
+    return result, current
+
+def resolve_coreference(text):
+    dfa = AnaphoraDFA(text)
+    annotations = dfa.run_structured()
+    return annotations, dfa.chains()
+
+
+STREAM_CONTEXT = 3
+STREAM_MAX_PENDING = 1 << 11
+
+
+class StreamSentence(NamedTuple):
+    index: int
+    start: int
+    text: str
+    result: str
+    annotations: List[Annotation]
+
+
+def _shift(annotation: Annotation, delta: int) -> Annotation:
+    antecedent_start, antecedent_end = annotation.antecedent_start, annotation.antecedent_end
+    if antecedent_start is not None:
+        antecedent_start += delta
+        antecedent_end += delta
+    return annotation._replace(start=annotation.start + delta, end=annotation.end + delta,
+                               antecedent_start=antecedent_start, antecedent_end=antecedent_end)
+
+def _sentence_segments(text: str) -> List[str]:
+    spans = get_sentence_spans(text)
+    bounds = [0] + [start for start, _ in spans[1:]] + [len(text)]
+    return [text[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1)]
+
+def _rescan_start(text: str) -> int:
+    cut = len(text)
+    for _ in range(2):
+        while cut and text[cut - 1].isspace():
+            cut -= 1
+        while cut and not text[cut - 1].isspace():
+            cut -= 1
+    return cut
+
+def _force_split(text: str, limit: int) -> int:
+    cut = max(text.rfind(' ', 0, limit), text.rfind('\n', 0, limit))
+    return cut + 1 if cut > 0 else limit
+
+def iter_resolve_stream(chunks: Iterable[str], context: int = STREAM_CONTEXT, sep: str = '',
+                        max_pending: int = STREAM_MAX_PENDING) -> Iterator[StreamSentence]:
+    history = deque(maxlen=context)
+    pending = None
+    offset = index = 0
+
+    def resolve(segment):
+        nonlocal offset, index
+        prefix = ''.join(history)
+        annotations = AnaphoraDFA(prefix + segment, start=len(prefix)).run_structured()
+        local = [_shift(a, -len(prefix)) for a in annotations]
+        item = StreamSentence(index, offset, segment, render_annotations(segment, local),
+                              [_shift(a, offset) for a in local])
+        history.append(segment)
+        offset += len(segment)
+        index += 1
+        return item
+
+    for chunk in chunks:
+        if pending is None:
+            cut, pending = 0, chunk
+        else:
+            cut, pending = _rescan_start(pending), pending + sep + chunk
+        segments = _sentence_segments(pending[cut:])
+        if len(segments) > 1:
+            segments[0] = pending[:cut] + segments[0]
+            for segment in segments[:-1]:
+                yield resolve(segment)
+            pending = segments[-1]
+        while len(pending) > max_pending:
+            cut = _force_split(pending, max_pending)
+            yield resolve(pending[:cut])
+            pending = pending[cut:]
+    if pending:
+        yield resolve(pending)
+
+
+class BatchResult(NamedTuple):
+    index: int
+    result: Optional[object]
+    error: Optional[str]
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _warm_up():
+    get_lexicon()
+    analyze('мама')
+    get_sentence_spans('Мама пришла. Она устала.')
+
+def _resolve_one(item):
+    index, text, structured = item
+    try:
+        result = resolve_pronouns_structured(text) if structured else resolve_pronouns(text)
+        return BatchResult(index, result, None)
+    except Exception as e:
+        return BatchResult(index, None, f"{type(e).__name__}: {e}")
+
+def _resolve_chunk(chunk):
+    return [_resolve_one(item) for item in chunk]
+
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def iter_resolve_many(texts: Iterable[str], workers: Optional[int] = None, chunksize: int = 64,
+                      structured: bool = False, max_in_flight: Optional[int] = None) -> Iterator[BatchResult]:
+    items = ((i, text, structured) for i, text in enumerate(texts))
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for item in items:
+            yield _resolve_one(item)
+        return
+    max_in_flight = max_in_flight or workers * 4
+    with multiprocessing.Pool(workers, initializer=_warm_up) as pool:
+        pending = deque()
+        for chunk in _chunks(items, chunksize):
+            pending.append(pool.apply_async(_resolve_chunk, (chunk,)))
+            if len(pending) >= max_in_flight:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+def resolve_many(texts: Iterable[str], workers: Optional[int] = None, chunksize: int = 64,
+                 structured: bool = False) -> List[BatchResult]:
+    return list(iter_resolve_many(texts, workers, chunksize, structured))
@@ -1,32 +1,159 @@
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Dict, FrozenSet, NamedTuple, Optional
 from .data_loader import load_word_set
-from .morph import normalize_word, morph
-
-DATA_DIR = 'data/'
-
-personal_pronouns = load_word_set(DATA_DIR + 'Личные.txt')
-possessive_pronouns = load_word_set(DATA_DIR + 'Притяжательные.txt')
-ambiguous_pronouns = load_word_set(DATA_DIR + 'Лично-притяжательные.txt')
-reflexive_pronouns = load_word_set(DATA_DIR + 'Возвратные.txt')
-relative_pronouns = load_word_set(DATA_DIR + 'Относительные.txt')
-
-_demonstrative_base = load_word_set(DATA_DIR + 'Указательные.txt')
-demonstrative_pronouns = set(_demonstrative_base)
-for base in _demonstrative_base:
-    parsed = morph.parse(base)
-    if parsed:
-        for form in parsed[0].lexeme:
-            demonstrative_pronouns.add(normalize_word(form.word))
-
-collective_nouns = load_word_set(DATA_DIR + 'Собирательные.txt')
-common_gender_nouns = load_word_set(DATA_DIR + 'Общий род.txt')
-idioms = load_word_set(DATA_DIR + 'Идиомы.txt')
-
-all_pronouns = (
-    personal_pronouns |
-    possessive_pronouns |
-    ambiguous_pronouns |
-    reflexive_pronouns |
-    relative_pronouns |
-    demonstrative_pronouns
+from .morph import normalize_word
+
+DATA_DIR = Path(os.environ.get('ANAPHORA_DATA_DIR') or Path(__file__).resolve().parent.parent / 'data')
+CACHE_DIR = Path(os.environ.get('ANAPHORA_CACHE_DIR') or Path.home() / '.cache' / 'anaphora')
+LEXICON_VERSION = 1
+
+SOURCES = {
+    'personal_pronouns': 'Личные.txt',
+    'possessive_pronouns': 'Притяжательные.txt',
+    'ambiguous_pronouns': 'Лично-притяжательные.txt',
+    'reflexive_pronouns': 'Возвратные.txt',
+    'relative_pronouns': 'Относительные.txt',
+    'demonstrative_pronouns': 'Указательные.txt',
+    'collective_nouns': 'Собирательные.txt',
+    'common_gender_nouns': 'Общий род.txt',
+    'idioms': 'Идиомы.txt',
+}
+
+PRONOUN_SETS = (
+    'personal_pronouns',
+    'possessive_pronouns',
+    'ambiguous_pronouns',
+    'reflexive_pronouns',
+    'relative_pronouns',
+    'demonstrative_pronouns',
+)
+
+PRONOUN_TYPES = (
+    ('personal_pronouns', 'личное'),
+    ('possessive_pronouns', 'притяжательное'),
+    ('reflexive_pronouns', 'возвратное'),
+    ('demonstrative_pronouns', 'указательное'),
+    ('relative_pronouns', 'относительное'),
 )
 
+
+class PronounEntry(NamedTuple):
+    type: str
+    ambiguous: bool = False
+
+
+def build_pronoun_types(sets: Dict[str, FrozenSet[str]]) -> Dict[str, PronounEntry]:
+    table = {form: PronounEntry('личное', True) for form in sets['ambiguous_pronouns']}
+    for name, pronoun_type in PRONOUN_TYPES:
+        entry = PronounEntry(pronoun_type)
+        for form in sets[name]:
+            table.setdefault(form, entry)
+    return table
+
+
+class Lexicon:
+    def __init__(self, sets: Dict[str, FrozenSet[str]]):
+        self.sets = sets
+        for name, words in sets.items():
+            setattr(self, name, words)
+        self.all_pronouns = frozenset().union(*(sets[name] for name in PRONOUN_SETS))
+        self.pronoun_types = build_pronoun_types(sets)
+
+
+_lexicon: Optional[Lexicon] = None
+
+
+def source_hashes(data_dir: Path = None) -> Dict[str, str]:
+    data_dir = Path(data_dir or DATA_DIR)
+    return {name: hashlib.sha256((data_dir / filename).read_bytes()).hexdigest()
+            for name, filename in SOURCES.items()}
+
+
+def lexicon_key(hashes: Dict[str, str]) -> str:
+    digest = hashlib.sha256(str(LEXICON_VERSION).encode())
+    for name in sorted(hashes):
+        digest.update(f"{name}:{hashes[name]}".encode())
+    return digest.hexdigest()[:16]
+
+
+def artifact_path(hashes: Dict[str, str], cache_dir: Path = None) -> Path:
+    return Path(cache_dir or CACHE_DIR) / f"lexicon-{lexicon_key(hashes)}.json"
+
+
+def expand_lexemes(words):
+    from .morph import morph
+    forms = set(words)
+    for base in words:
+        parsed = morph.parse(base)
+        if parsed:
+            for form in parsed[0].lexeme:
+                forms.add(normalize_word(form.word))
+    return forms
+
+
+def compile_lexicon(data_dir: Path = None) -> Dict[str, FrozenSet[str]]:
+    data_dir = Path(data_dir or DATA_DIR)
+    sets = {name: load_word_set(data_dir / filename) for name, filename in SOURCES.items()}
+    sets['demonstrative_pronouns'] = expand_lexemes(sets['demonstrative_pronouns'])
+    return {name: frozenset(words) for name, words in sets.items()}
+
+
+def save_lexicon(sets: Dict[str, FrozenSet[str]], hashes: Dict[str, str], path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {
+        'version': LEXICON_VERSION,
+        'hashes': hashes,
+        'sets': {name: sorted(words) for name, words in sets.items()},
+    }
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(payload, ensure_ascii=False), encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def read_lexicon(path: Path, hashes: Dict[str, str]) -> Optional[Dict[str, FrozenSet[str]]]:
+    try:
+        payload = json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    if payload.get('version') != LEXICON_VERSION or payload.get('hashes') != hashes:
+        return None
+    return {name: frozenset(words) for name, words in payload['sets'].items()}
+
+
+def load_lexicon(data_dir: Path = None, cache_dir: Path = None) -> Lexicon:
+    hashes = source_hashes(data_dir)
+    path = artifact_path(hashes, cache_dir)
+    sets = read_lexicon(path, hashes)
+    if sets is None:
+        sets = compile_lexicon(data_dir)
+        try:
+            save_lexicon(sets, hashes, path)
+        except OSError:
+            pass
+    return Lexicon(sets)
+
+
+def get_lexicon() -> Lexicon:
+    global _lexicon
+    if _lexicon is None:
+        _lexicon = load_lexicon()
+    return _lexicon
+
+
+def __getattr__(name):
+    if name in SOURCES or name == 'all_pronouns':
+        return getattr(get_lexicon(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+if __name__ == '__main__':
+    hashes = source_hashes()
+    target = Path(sys.argv[1]) if len(sys.argv) > 1 else artifact_path(hashes)
+    if target.is_dir():
+        target = artifact_path(hashes, target)
+    save_lexicon(compile_lexicon(), hashes, target)
+    print(target)
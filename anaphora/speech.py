@@ -0,0 +1,135 @@
+import re
+from bisect import bisect_right
+from typing import List, Optional
+from .morph import get_pos
+
+QUOTE_PATTERN = re.compile(r'«[^«»]*?»|\"[^\"]*?\"')
+CYRILLIC_WORD_PATTERN = re.compile(r'[А-ЯЁа-яё]+')
+AUTHOR_PUNCTUATION = ':,-'
+DIALOGUE_DASH = '-'
+
+
+def _is_cyrillic(ch: str) -> bool:
+    return 'А' <= ch <= 'я' or ch == 'Ё' or ch == 'ё'
+
+
+def author_before(text: str, end: int) -> Optional[str]:
+    i = end - 1
+    while i >= 0 and text[i].isspace():
+        i -= 1
+    if i < 0 or text[i] not in AUTHOR_PUNCTUATION:
+        return None
+    i -= 1
+    while i >= 0 and text[i].isspace():
+        i -= 1
+    word_end = i + 1
+    while i >= 0 and _is_cyrillic(text[i]):
+        i -= 1
+    if i + 1 == word_end:
+        return None
+    word_start = i + 1
+    while i >= 0 and text[i].isspace():
+        i -= 1
+    if i + 1 < word_start:
+        first_end = i + 1
+        while i >= 0 and _is_cyrillic(text[i]):
+            i -= 1
+        if i + 1 < first_end:
+            return text[i + 1:word_end]
+    return text[word_start:word_end]
+
+
+class SpeechSpan:
+    __slots__ = ('start', 'end', 'kind', 'speaker', '_resolved', '_attribution')
+
+    def __init__(self, start: int, end: int, kind: str, speaker: Optional[str] = None, resolved: bool = False):
+        self.start = start
+        self.end = end
+        self.kind = kind
+        self.speaker = speaker
+        self._resolved = resolved
+        self._attribution: Optional[List[str]] = None
+
+    def __repr__(self):
+        return f"SpeechSpan({self.start}, {self.end}, {self.kind!r}, {self.speaker!r})"
+
+
+class SpeechIndex:
+    def __init__(self, text: str):
+        self.text = text
+        self.quotes: List[SpeechSpan] = [SpeechSpan(m.start(), m.end(), 'quote') for m in QUOTE_PATTERN.finditer(text)]
+        self._quote_starts = [s.start for s in self.quotes]
+        self.dialogue: List[SpeechSpan] = []
+        self._index_dialogue()
+        self._dialogue_starts = [s.start for s in self.dialogue]
+
+    def _index_dialogue(self):
+        if '\n' not in self.text and not self.text.lstrip().startswith(DIALOGUE_DASH):
+            return
+        author = None
+        offset = 0
+        for line in self.text.split('\n'):
+            stripped = line.strip()
+            if stripped.startswith(DIALOGUE_DASH):
+                self.dialogue.append(SpeechSpan(offset, offset + len(line), 'dialogue', author, True))
+            elif stripped:
+                parts = stripped.split(',', 1)
+                author = parts[1].strip() if len(parts) == 2 else stripped
+            offset += len(line) + 1
+
+    def _quote_at(self, position: int) -> Optional[SpeechSpan]:
+        i = bisect_right(self._quote_starts, position) - 1
+        if i >= 0 and position < self.quotes[i].end:
+            return self.quotes[i]
+        return None
+
+    def _dialogue_at(self, position: int) -> Optional[SpeechSpan]:
+        i = bisect_right(self._dialogue_starts, position) - 1
+        if i >= 0 and position < self.dialogue[i].end:
+            return self.dialogue[i]
+        return None
+
+    def span_at(self, position: Optional[int]) -> Optional[SpeechSpan]:
+        if position is None or position < 0:
+            return None
+        return self._quote_at(position) or self._dialogue_at(position)
+
+    def speaker_at(self, position: Optional[int]) -> Optional[str]:
+        span = self.span_at(position)
+        if span is None:
+            return None
+        if not span._resolved:
+            span.speaker = self._quote_speaker(span)
+            span._resolved = True
+        return span.speaker
+
+    def attribution_at(self, position: Optional[int]) -> List[str]:
+        if position is None or position < 0:
+            return []
+        span = self._quote_at(position)
+        if span is None:
+            return []
+        if span._attribution is None:
+            span._attribution = [w for w in self._words_after(span.end) if get_pos(w) == 'NOUN']
+        return span._attribution
+
+    def _words_after(self, position: int):
+        for m in CYRILLIC_WORD_PATTERN.finditer(self.text, position):
+            yield m.group(0)
+
+    def _quote_speaker(self, span: SpeechSpan) -> Optional[str]:
+        candidate = author_before(self.text, span.start)
+        if candidate is not None:
+            words = CYRILLIC_WORD_PATTERN.findall(candidate)
+            name_parts = [w for w in words[-2:] if get_pos(w) == 'NOUN']
+            if name_parts:
+                return " ".join(name_parts)
+            return candidate
+        words = self._words_after(span.end)
+        for word in words:
+            if get_pos(word) == 'NOUN':
+                following = next(words, None)
+                if following is not None and get_pos(following) == 'NOUN':
+                    return f"{word} {following}"
+                return word
+        return None
@@ -1,25 +1,109 @@
+import os
 import re
-from nltk.tokenize import sent_tokenize, word_tokenize
-from .resources import all_pronouns
+from typing import List, Optional
+from .resources import get_lexicon
 from .morph import normalize_word
+from . import instrumentation
 
-def find_pronoun_indices(text: str):
-    pattern = r'\b[а-яё]+\b'
-    lower_text = text.lower()
-    matches = re.finditer(pattern, lower_text)
-    indices = []
-    for match in matches:
+NLTK_PACKAGES = ('punkt_tab',)
+
+OFFLINE = os.environ.get('ANAPHORA_OFFLINE', '').lower() not in ('', '0', 'false', 'no')
+
+TOKEN_PATTERN = re.compile(r'\w+(?:-\w+)*')
+CYRILLIC_TOKEN_PATTERN = re.compile(r'[а-яёА-ЯЁ]+(?:-[а-яёА-ЯЁ]+)*')
+
+_sentence_tokenizer = None
+_nltk_ready = False
+
+
+class Token:
+    __slots__ = ('text', 'start', 'end', 'index', 'is_word', 'next')
+
+    def __init__(self, text: str, start: int, end: int, index: int, is_word: bool):
+        self.text = text
+        self.start = start
+        self.end = end
+        self.index = index
+        self.is_word = is_word
+        self.next: Optional['Token'] = None
+
+    def next_word(self) -> Optional['Token']:
+        token = self.next
+        while token is not None and not token.is_word:
+            token = token.next
+        return token
+
+    def __repr__(self):
+        return f"Token({self.text!r}, {self.start}, {self.end})"
+
+
+def set_offline(offline: bool = True):
+    global OFFLINE
+    OFFLINE = offline
+
+def ensure_nltk_data():
+    global _nltk_ready
+    if _nltk_ready:
+        return
+    import nltk
+    for package in NLTK_PACKAGES:
+        try:
+            nltk.data.find(f'tokenizers/{package}')
+        except LookupError:
+            if OFFLINE:
+                raise LookupError(
+                    f"NLTK resource '{package}' is not installed and offline mode is on; "
+                    f"run `python -m nltk.downloader {package}` or set NLTK_DATA"
+                )
+            nltk.download(package, quiet=True)
+    _nltk_ready = True
+
+def _count_call(name: str):
+    metrics = instrumentation.active()
+    if metrics is not None:
+        metrics.incr(name)
+
+def tokenize(text: str) -> List[Token]:
+    _count_call('tokenizer_calls')
+    tokens = []
+    previous = None
+    is_word = CYRILLIC_TOKEN_PATTERN.fullmatch
+    for index, match in enumerate(TOKEN_PATTERN.finditer(text)):
         word = match.group()
-        normalized_word = normalize_word(word)
-        if normalized_word in all_pronouns:
-            start = match.start()
-            end = match.end()
-            indices.append((start, end))
+        token = Token(word, match.start(), match.end(), index, is_word(word) is not None)
+        if previous is not None:
+            previous.next = token
+        tokens.append(token)
+        previous = token
+    return tokens
+
+def find_pronoun_indices(text: str, tokens: Optional[List[Token]] = None):
+    all_pronouns = get_lexicon().all_pronouns
+    if tokens is None:
+        tokens = tokenize(text)
+    indices = []
+    for token in tokens:
+        if token.is_word and normalize_word(token.text) in all_pronouns:
+            indices.append((token.start, token.end))
     return indices
 
 def get_sentences(text: str):
+    _count_call('tokenizer_sentence_calls')
+    ensure_nltk_data()
+    from nltk.tokenize import sent_tokenize
     return sent_tokenize(text, language='russian')
 
+def get_sentence_spans(text: str):
+    global _sentence_tokenizer
+    _count_call('tokenizer_sentence_calls')
+    if _sentence_tokenizer is None:
+        ensure_nltk_data()
+        from nltk.tokenize.punkt import PunktTokenizer
+        _sentence_tokenizer = PunktTokenizer('russian')
+    return list(_sentence_tokenizer.span_tokenize(text))
+
 def get_words(text: str):
+    _count_call('tokenizer_word_calls')
+    ensure_nltk_data()
+    from nltk.tokenize import word_tokenize
     return word_tokenize(text, language='russian')
-
@@ -0,0 +1,58 @@
+import re
+from bisect import bisect_left
+from typing import List, NamedTuple, Optional
+from .morph import analyze, get_pos
+
+PHRASE_PATTERN = re.compile(r'[А-ЯЁа-яё]+(?:\s+[А-ЯЁа-яё]+)*')
+
+
+class Vocative(NamedTuple):
+    start: int
+    end: int
+    text: str
+    head: Optional[str]
+    gender: Optional[str]
+    number: Optional[str]
+
+
+def _vocative(phrase: str, start: int) -> Vocative:
+    end = start + len(phrase)
+    head = next((w for w in phrase.split() if get_pos(w) == 'NOUN'), None)
+    if head is None:
+        return Vocative(start, end, phrase, None, None, None)
+    parsed = analyze(head)
+    return Vocative(start, end, phrase, head, parsed.gender, parsed.number)
+
+
+class VocativeIndex:
+    def __init__(self, text: str, offset: int = 0):
+        self.offset = offset
+        self.commas: List[int] = [i for i, ch in enumerate(text) if ch == ',']
+        count = len(self.commas)
+        phrases: List[Optional[Vocative]] = [None] * count
+        for k in range(count - 1):
+            left = self.commas[k] + 1
+            segment = text[left:self.commas[k + 1]]
+            phrase = segment.strip()
+            if phrase and PHRASE_PATTERN.fullmatch(phrase):
+                start = offset + left + len(segment) - len(segment.lstrip())
+                phrases[k] = _vocative(phrase, start)
+        self._first_phrase = [count] * (count + 1)
+        self._answers: List[Optional[Vocative]] = [None] * (count + 2)
+        for k in range(count - 1, -1, -1):
+            self._first_phrase[k] = k if phrases[k] is not None else self._first_phrase[k + 1]
+            phrase = phrases[k]
+            if phrase is not None:
+                if phrase.head is not None:
+                    self._answers[k] = phrase
+                else:
+                    self._answers[k] = self._answer_from(k + 2)
+        self.vocatives: List[Vocative] = [p for p in phrases if p is not None and p.head is not None]
+
+    def _answer_from(self, k: int) -> Optional[Vocative]:
+        if k >= len(self.commas):
+            return None
+        return self._answers[self._first_phrase[k]]
+
+    def after(self, position: int) -> Optional[Vocative]:
+        return self._answer_from(bisect_left(self.commas, position - self.offset))
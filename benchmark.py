@@ -0,0 +1,228 @@
+import argparse
+import json
+import math
+import platform
+import re
+import sys
+import time
+from itertools import chain, islice
+from pathlib import Path
+from anaphora.dfa import AnaphoraDFA
+from anaphora.instrumentation import Metrics
+from anaphora.resolver import resolve_pronouns, resolve_pronouns_instrumented
+
+DEFAULT_DATASET = Path(__file__).resolve().parent / 'neural_model' / 'dataset.txt'
+ANNOTATION_PATTERN = re.compile(r' \[([^\]]*)\]')
+
+
+def read_pairs(path, limit=None):
+    count = 0
+    pending = None
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line.strip():
+                continue
+            if pending is None:
+                pending = line
+            else:
+                yield pending, line
+                pending = None
+                count += 1
+                if limit is not None and count >= limit:
+                    break
+
+
+def split_annotations(annotated):
+    annotations = {}
+    parts = []
+    last = 0
+    offset = 0
+    for match in ANNOTATION_PATTERN.finditer(annotated):
+        parts.append(annotated[last:match.start()])
+        offset += match.start() - last
+        annotations[offset] = match.group(1)
+        last = match.end()
+    parts.append(annotated[last:])
+    return ''.join(parts), annotations
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def score(gold, output, ignore_case=False):
+    _, expected = split_annotations(gold)
+    _, predicted = split_annotations(output)
+    correct = 0
+    for pos, antecedent in expected.items():
+        got = predicted.get(pos)
+        if got is None:
+            continue
+        if got == antecedent or ignore_case and got.lower() == antecedent.lower():
+            correct += 1
+    return len(expected), len(predicted), correct
+
+
+def run_benchmark(pairs, warmup=1, ignore_case=False, instrument=False, slo_ms=None):
+    pairs = iter(pairs)
+    head = list(islice(pairs, warmup))
+    for text, _ in head:
+        resolve_pronouns(text)
+
+    totals = Metrics() if instrument else None
+    documents = []
+    latencies = []
+    pronouns = gold_total = predicted_total = correct_total = exact = 0
+    started = time.perf_counter()
+    for index, (text, gold) in enumerate(chain(head, pairs)):
+        metrics = None
+        t0 = time.perf_counter()
+        if instrument:
+            output, metrics = resolve_pronouns_instrumented(text)
+            pronouns += metrics.counters.get('pronouns', 0)
+        else:
+            dfa = AnaphoraDFA(text)
+            output = dfa.run()
+            pronouns += len(dfa.pronoun_spans)
+        latency = time.perf_counter() - t0
+        latencies.append(latency)
+        expected, predicted, correct = score(gold, output, ignore_case)
+        gold_total += expected
+        predicted_total += predicted
+        correct_total += correct
+        exact += output == gold
+        documents.append({'index': index, 'output': output, 'gold_pronouns': expected,
+                          'predicted_pronouns': predicted, 'correct': correct})
+        if metrics is not None:
+            totals.merge(metrics)
+            if slo_ms is not None and 1000 * latency > slo_ms:
+                documents[-1]['metrics'] = metrics.as_dict()
+    elapsed = time.perf_counter() - started
+    count = len(documents)
+
+    summary = {
+        'documents': count,
+        'pronouns': pronouns,
+        'elapsed_s': elapsed,
+        'docs_per_s': count / elapsed if elapsed else 0.0,
+        'pronouns_per_s': pronouns / elapsed if elapsed else 0.0,
+        'latency_ms': {
+            'mean': 1000 * elapsed / count if count else 0.0,
+            'p50': 1000 * percentile(latencies, 50),
+            'p95': 1000 * percentile(latencies, 95),
+            'p99': 1000 * percentile(latencies, 99),
+            'max': 1000 * max(latencies, default=0.0),
+        },
+        'gold_pronouns': gold_total,
+        'predicted_pronouns': predicted_total,
+        'correct_pronouns': correct_total,
+        'accuracy': correct_total / gold_total if gold_total else 0.0,
+        'precision': correct_total / predicted_total if predicted_total else 0.0,
+        'document_exact_match': exact / count if count else 0.0,
+    }
+    if totals is not None:
+        summary['metrics'] = totals.as_dict()
+        if slo_ms is not None:
+            summary['slo_ms'] = slo_ms
+            summary['over_slo'] = sum(1000 * latency > slo_ms for latency in latencies)
+    for doc, latency in zip(documents, latencies):
+        doc['latency_ms'] = 1000 * latency
+    return summary, documents, totals
+
+
+def print_summary(summary, out=sys.stdout):
+    latency = summary['latency_ms']
+    print(f"документов: {summary['documents']}, местоимений: {summary['pronouns']}, "
+          f"время: {summary['elapsed_s']:.2f} с", file=out)
+    print(f"скорость: {summary['docs_per_s']:.1f} док/с, {summary['pronouns_per_s']:.1f} мест/с", file=out)
+    print(f"задержка, мс: p50 {latency['p50']:.2f}, p95 {latency['p95']:.2f}, "
+          f"p99 {latency['p99']:.2f}, max {latency['max']:.2f}", file=out)
+    print(f"точность по местоимениям: {summary['accuracy']:.4f} "
+          f"({summary['correct_pronouns']}/{summary['gold_pronouns']}), "
+          f"precision: {summary['precision']:.4f}, "
+          f"точное совпадение документов: {summary['document_exact_match']:.4f}", file=out)
+    if 'over_slo' in summary:
+        print(f"медленнее {summary['slo_ms']} мс: {summary['over_slo']} документов", file=out)
+    stages = summary.get('metrics', {}).get('timings', {})
+    for group in ('state', 'filter'):
+        for label, timer in sorted(stages.get(group, {}).items(), key=lambda item: -item[1]['total_s']):
+            print(f"  {group} {label}: {1000 * timer['total_s']:.1f} мс за {timer['count']} вызовов, "
+                  f"max {1000 * timer['max_s']:.2f} мс", file=out)
+
+
+def compare(before_path, after_path, show=10, out=sys.stdout):
+    with open(before_path, 'r', encoding='utf-8') as f:
+        before = json.load(f)
+    with open(after_path, 'r', encoding='utf-8') as f:
+        after = json.load(f)
+    a, b = before['summary'], after['summary']
+    if a['documents'] != b['documents']:
+        print(f"внимание: разное число документов ({a['documents']} и {b['documents']})", file=out)
+    for key in ('docs_per_s', 'pronouns_per_s'):
+        ratio = b[key] / a[key] if a[key] else 0.0
+        print(f"{key}: {a[key]:.1f} -> {b[key]:.1f} (x{ratio:.2f})", file=out)
+    for key in ('p50', 'p95', 'p99'):
+        print(f"latency {key}: {a['latency_ms'][key]:.2f} -> {b['latency_ms'][key]:.2f} мс", file=out)
+    for key in ('accuracy', 'precision', 'document_exact_match'):
+        print(f"{key}: {a[key]:.4f} -> {b[key]:.4f} ({b[key] - a[key]:+.4f})", file=out)
+
+    outputs = {doc['index']: doc['output'] for doc in before['documents']}
+    changed = [doc for doc in after['documents']
+               if doc['index'] in outputs and outputs[doc['index']] != doc['output']]
+    print(f"изменившихся результатов: {len(changed)}", file=out)
+    for doc in changed[:show]:
+        print(f"[{doc['index']}]\n- {outputs[doc['index']]}\n+ {doc['output']}", file=out)
+    return len(changed)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк скорости и точности на neural_model/dataset.txt")
+    parser.add_argument('--dataset', default=str(DEFAULT_DATASET), help="файл с парами вход/эталон")
+    parser.add_argument('-n', '--limit', type=int, default=None, help="число пар из начала файла")
+    parser.add_argument('--warmup', type=int, default=1, help="документов для прогрева перед замером")
+    parser.add_argument('--ignore-case', action='store_true', help="сравнивать антецеденты без учёта регистра")
+    parser.add_argument('-o', '--output', help="сохранить результаты в JSON")
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help="сравнить два сохранённых прогона")
+    parser.add_argument('--instrument', action='store_true', help="собирать время по состояниям и фильтрам и счётчики")
+    parser.add_argument('--slo-ms', type=float, default=None, help="сохранять метрики документов медленнее порога")
+    parser.add_argument('--prometheus', help="записать суммарные метрики в формате Prometheus")
+    parser.add_argument('--show', type=int, default=10, help="сколько изменившихся результатов показать")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.compare:
+        changed = compare(args.compare[0], args.compare[1], args.show)
+        return 1 if changed else 0
+    pairs = read_pairs(args.dataset, args.limit)
+    summary, documents, totals = run_benchmark(pairs, args.warmup, args.ignore_case,
+                                               args.instrument or bool(args.prometheus), args.slo_ms)
+    print_summary(summary)
+    if args.prometheus and totals is not None:
+        with open(args.prometheus, 'w', encoding='utf-8') as f:
+            f.write(totals.to_prometheus())
+    if args.output:
+        report = {
+            'meta': {
+                'dataset': args.dataset,
+                'limit': args.limit,
+                'ignore_case': args.ignore_case,
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            },
+            'summary': summary,
+            'documents': documents,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
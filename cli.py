@@ -1,6 +1,15 @@
-from anaphora.resolver import resolve_pronouns
+import argparse
+import json
+import sys
+import time
+from collections import deque
+from anaphora.resolver import resolve_pronouns, iter_resolve_many, iter_resolve_stream
 
-def main():
+PROGRESS_INTERVAL = 2.0
+STREAM_BLOCK = 1 << 16
+
+
+def interactive():
     while True:
         text_example = input("Введите текст для разрешения местоимений (или 'exit' для выхода): ")
         if text_example.lower() == 'exit':
@@ -8,6 +17,155 @@ def main():
         resolved_text = resolve_pronouns(text_example)
         print("Результат:", resolved_text)
 
+
+def read_lines(stream):
+    for line in stream:
+        yield None, line.rstrip('\n')
+
+
+def read_paragraphs(stream):
+    paragraph = []
+    for line in stream:
+        line = line.rstrip('\n')
+        if line.strip():
+            paragraph.append(line)
+        elif paragraph:
+            yield None, '\n'.join(paragraph)
+            paragraph = []
+    if paragraph:
+        yield None, '\n'.join(paragraph)
+
+
+def read_jsonl(stream, field):
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            text = record[field]
+        except (ValueError, KeyError, TypeError) as e:
+            yield {'raw': line.rstrip('\n'), 'error': f"{type(e).__name__}: {e}"}, None
+            continue
+        yield record, text
+
+
+def read_blocks(stream, size=STREAM_BLOCK):
+    while True:
+        block = stream.read(size)
+        if not block:
+            break
+        yield block
+
+
+def write_result(out, fmt, record, text, result, error):
+    if fmt == 'jsonl':
+        record = dict(record)
+        if error is None:
+            record['result'] = result
+        else:
+            record.setdefault('error', error)
+        out.write(json.dumps(record, ensure_ascii=False) + '\n')
+    else:
+        out.write((result if error is None else text) + ('\n\n' if fmt == 'paragraphs' else '\n'))
+
+
+def run_batch(args):
+    source = sys.stdin if args.input == '-' else open(args.input, 'r', encoding='utf-8')
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    if args.format == 'jsonl':
+        documents = read_jsonl(source, args.field)
+    elif args.format == 'paragraphs':
+        documents = read_paragraphs(source)
+    else:
+        documents = read_lines(source)
+
+    in_flight = deque()
+
+    def texts():
+        for record, text in documents:
+            in_flight.append((record, text))
+            yield text if text is not None else ''
+
+    processed = errors = chars = 0
+    started = last_report = time.monotonic()
+    try:
+        for item in iter_resolve_many(texts(), workers=args.jobs, chunksize=args.chunksize,
+                                      max_in_flight=args.max_in_flight):
+            record, text = in_flight.popleft()
+            error = item.error
+            if record is not None and 'error' in record and text is None:
+                error = record['error']
+            if error is not None:
+                errors += 1
+                print(f"документ {item.index}: {error}", file=sys.stderr)
+            write_result(out, args.format, record or {}, text, item.result, error)
+            processed += 1
+            chars += len(text or '')
+            now = time.monotonic()
+            if not args.quiet and now - last_report >= PROGRESS_INTERVAL:
+                elapsed = now - started
+                print(f"обработано: {processed}, {processed / elapsed:.1f} док/с", file=sys.stderr)
+                last_report = now
+    finally:
+        out.flush()
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+    if not args.quiet:
+        elapsed = max(time.monotonic() - started, 1e-9)
+        print(f"итого: {processed} документов, ошибок: {errors}, {elapsed:.2f} с, "
+              f"{processed / elapsed:.1f} док/с, {chars / elapsed:.0f} симв/с", file=sys.stderr)
+
+
+def run_stream(args):
+    source = sys.stdin if args.input == '-' else open(args.input, 'r', encoding='utf-8')
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    processed = chars = 0
+    started = last_report = time.monotonic()
+    try:
+        for item in iter_resolve_stream(read_blocks(source), context=args.context):
+            out.write(item.result)
+            processed += 1
+            chars += len(item.text)
+            now = time.monotonic()
+            if not args.quiet and now - last_report >= PROGRESS_INTERVAL:
+                print(f"обработано: {processed} предложений, {chars / (now - started):.0f} симв/с", file=sys.stderr)
+                last_report = now
+    finally:
+        out.flush()
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+    if not args.quiet:
+        elapsed = max(time.monotonic() - started, 1e-9)
+        print(f"итого: {processed} предложений, {elapsed:.2f} с, {chars / elapsed:.0f} симв/с", file=sys.stderr)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Разрешение местоимённой анафоры")
+    parser.add_argument('input', nargs='?', help="входной файл ('-' для stdin); без аргумента — интерактивный режим")
+    parser.add_argument('-o', '--output', default='-', help="выходной файл ('-' для stdout)")
+    parser.add_argument('-f', '--format', choices=('lines', 'paragraphs', 'jsonl', 'stream'), default='lines',
+                        help="документ на строку, абзацы через пустую строку, JSONL или один длинный документ потоком")
+    parser.add_argument('--field', default='text', help="поле с текстом в JSONL")
+    parser.add_argument('-j', '--jobs', type=int, default=1, help="число процессов")
+    parser.add_argument('--chunksize', type=int, default=64, help="документов в одном задании")
+    parser.add_argument('--max-in-flight', type=int, default=None, help="максимум заданий в обработке")
+    parser.add_argument('--context', type=int, default=3, help="предложений контекста в потоковом режиме")
+    parser.add_argument('-q', '--quiet', action='store_true', help="не выводить прогресс в stderr")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.input is None:
+        interactive()
+    elif args.format == 'stream':
+        run_stream(args)
+    else:
+        run_batch(args)
+
 if __name__ == '__main__':
     main()
-
@@ -0,0 +1,18 @@
+import pytest
+from anaphora.morph import _cache_size_from_env
+
+
+def test_cache_size_default(monkeypatch):
+    monkeypatch.delenv('ANAPHORA_MORPH_CACHE_SIZE', raising=False)
+    assert _cache_size_from_env() == 65536
+
+
+def test_cache_size_from_env(monkeypatch):
+    monkeypatch.setenv('ANAPHORA_MORPH_CACHE_SIZE', ' 1024 ')
+    assert _cache_size_from_env() == 1024
+
+
+def test_cache_size_invalid_falls_back(monkeypatch):
+    monkeypatch.setenv('ANAPHORA_MORPH_CACHE_SIZE', 'big')
+    with pytest.warns(UserWarning):
+        assert _cache_size_from_env() == 65536